@@ -1,10 +1,28 @@
+import os
 import re
+import time
 import joblib
 
+from shadow import ShadowEvaluator
+
 # loading a very simple model
 clf = joblib.load("spam_classifier.joblib")
 vectorizer = joblib.load("vectorizer.joblib")
 
+# shadow mode: a candidate model scores a sample of messages in the background
+SHADOW_CLASSIFIER = os.environ.get("SHADOW_CLASSIFIER", "candidate_classifier.joblib")
+SHADOW_VECTORIZER = os.environ.get("SHADOW_VECTORIZER", "candidate_vectorizer.joblib")
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0.05"))
+
+shadow = None
+if os.path.exists(SHADOW_CLASSIFIER) and os.path.exists(SHADOW_VECTORIZER):
+    shadow_clf = joblib.load(SHADOW_CLASSIFIER)
+    shadow_vectorizer = joblib.load(SHADOW_VECTORIZER)
+    shadow = ShadowEvaluator(
+        lambda texts: shadow_clf.predict(shadow_vectorizer.transform(texts)),
+        sample_rate=SHADOW_SAMPLE_RATE,
+    )
+
 # safety checker for URLs
 BLACKLISTED_DOMAINS = {"badsite.ru", "scam-link.com", "malware-download.net"}
 
@@ -35,9 +53,15 @@ def analyze_email(subject, body, urls=None, attachments=None):
     results = {"spam_model": None, "urls": {}, "attachments": {}}
 
     # ML classification
-    prediction = clf.predict(vectorizer.transform([subject + " " + body]))
+    text = subject + " " + body
+    t0 = time.perf_counter()
+    prediction = clf.predict(vectorizer.transform([text]))
+    live_seconds = time.perf_counter() - t0
     results["spam_model"] = prediction[0]  # "spam" or "ham"
 
+    if shadow is not None:
+        shadow.offer(text, prediction[0], live_seconds)
+
     # URL checks
     if urls:
         for url in urls:
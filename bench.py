@@ -0,0 +1,327 @@
+import argparse
+import time
+
+# Small benchmarks for the scam detector. Run `python bench.py <name> -h`.
+
+
+def synthetic_emails(n, start_id=1):
+    from email_scam_ui import SAMPLE_EMAILS
+
+    templates = SAMPLE_EMAILS
+    for i in range(n):
+        t = templates[i % len(templates)]
+        yield {
+            "id": start_id + i,
+            "name": f"Inbox {start_id + i}",
+            "subject": t["subject"],
+            "body": t["body"] + f"\nRef #{i}\n",
+        }
+
+
+def _time_response(client, url):
+    t0 = time.perf_counter()
+    resp = client.get(url, buffered=False)
+    ttfb = None
+    size = 0
+    for chunk in resp.response:
+        if ttfb is None:
+            ttfb = time.perf_counter() - t0
+        size += len(chunk)
+    total = time.perf_counter() - t0
+    resp.close()
+    return ttfb, total, size
+
+
+def bench_stream(args):
+    import email_scam_ui
+
+    for e in synthetic_emails(args.messages, start_id=len(email_scam_ui.EMAILS) + 1):
+        email_scam_ui.add_email(e)
+    if not args.cold:
+        for e in email_scam_ui.EMAILS:
+            email_scam_ui.SCANNER.result(e)
+    client = email_scam_ui.app.test_client()
+    client.get("/")
+
+    print(f"Inbox with {len(email_scam_ui.EMAILS)} messages, best of {args.repeat}:")
+    for label, url in (("buffered", "/?stream=0"), ("streamed", "/?stream=1")):
+        runs = [_time_response(client, url) for _ in range(args.repeat)]
+        ttfb = min(r[0] for r in runs)
+        tti = min(r[1] for r in runs)
+        print(f"  {label:9} TTFB {ttfb * 1000:8.1f} ms   "
+              f"TTI {tti * 1000:8.1f} ms   {runs[0][2] / 1024:.0f} KiB")
+
+
+def bench_memory(args):
+    import gc
+    import tracemalloc
+
+    import email_scam_ui
+    from message_store import MessageStore, Verdict
+
+    # one real scan per template, copied per message the way ingest would store it
+    templates = [email_scam_ui.analyze_email(t["subject"], t["body"]).as_dict()
+                 for t in email_scam_ui.SAMPLE_EMAILS]
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return kept, used
+
+    def as_dicts():
+        out = []
+        for i, e in enumerate(synthetic_emails(args.messages)):
+            a = templates[i % len(templates)]
+            e["analysis"] = {**a, "urls": dict(a["urls"]), "matched_keywords": list(a["matched_keywords"]),
+                             "skipped": list(a["skipped"])}
+            out.append(e)
+        return out
+
+    def as_store():
+        store = MessageStore()
+        for i, e in enumerate(synthetic_emails(args.messages)):
+            a = templates[i % len(templates)]
+            msg = store.add(e["id"], e["name"], e["subject"], e["body"])
+            msg.analysis = Verdict(a["overall"], a["urls"], a["matched_keywords"],
+                                   a["spam_model"], a["skipped"], a["version"])
+        return store
+
+    _, dict_bytes = measure(as_dicts)
+    store, store_bytes = measure(as_store)
+    blob_bytes = store.blobs.segment._size
+
+    n = args.messages
+    print(f"{n} messages with stored verdicts:")
+    print(f"  dicts         {dict_bytes / n:7.0f} B/message on the heap")
+    print(f"  MessageStore  {store_bytes / n:7.0f} B/message on the heap "
+          f"+ {blob_bytes / n:.0f} B/message of mmapped body blob")
+
+
+def bench_burst(args):
+    import random
+
+    from burst import SLOT_SECONDS, SLOTS, BurstTracker
+
+    # background traffic over a skewed set of domains for a full window,
+    # then one new campaign domain starts appearing in a share of messages
+    rnd = random.Random(0)
+    background = [f"sender{i}.example" for i in range(args.domains)]
+    weights = [1 / (i + 1) for i in range(len(background))]
+    tracker = BurstTracker(clock=lambda: now)
+
+    n = args.messages
+    step = SLOT_SECONDS * SLOTS * 1.5 / n
+    campaign_start = int(n * 2 / 3)
+    now = 0.0
+    first_flag = None
+    observe = check = 0.0
+    for i in range(n):
+        now = i * step
+        keys = rnd.choices(background, weights, k=2)
+        if i >= campaign_start and rnd.random() < args.share:
+            keys.append("new-campaign.example")
+        t0 = time.perf_counter()
+        tracker.observe(keys)
+        t1 = time.perf_counter()
+        hit = tracker.check(keys)
+        check += time.perf_counter() - t1
+        observe += t1 - t0
+        if hit and hit[0] == "new-campaign.example" and first_flag is None:
+            first_flag = i
+        elif hit and hit[0] != "new-campaign.example" and i < campaign_start:
+            print(f"  false burst on {hit[0]} at message {i}")
+
+    counters = (SLOTS + 2) * tracker.depth * tracker.width
+    print(f"{n} messages, {args.domains} background domains, "
+          f"{counters * 4 / 2**20:.1f} MiB of counters")
+    print(f"  observe {observe / n * 1e6:5.1f} us/message   check {check / n * 1e6:5.1f} us/message")
+    if first_flag is None:
+        print("  campaign not flagged")
+    else:
+        print(f"  campaign flagged {(first_flag - campaign_start) * step:.0f} s after it started")
+    for key, count, score in tracker.heavy_hitters()[:5]:
+        print(f"  {key:24} {count:6} recent  score {score:.1f}")
+
+
+def bench_search(args):
+    import gc
+    import random
+    import tracemalloc
+
+    from search_index import SearchIndex
+
+    # independent of the template; "likely scam" is the rare filter (0.1%)
+    verdicts = ("likely scam", "scam", "suspicious", "probably safe")
+    weights = (0.001, 0.05, 0.1, 0.849)
+
+    def build(n):
+        rnd = random.Random(0)
+        index = SearchIndex()
+        for e, verdict in zip(synthetic_emails(n), rnd.choices(verdicts, weights, k=n)):
+            index.add(e["id"], e["subject"], e["body"], verdict)
+        return index
+
+    gc.collect()
+    tracemalloc.start()
+    sample = build(args.memory_sample)
+    per_message = tracemalloc.get_traced_memory()[0] / args.memory_sample
+    tracemalloc.stop()
+    del sample
+
+    t0 = time.perf_counter()
+    index = build(args.messages)
+    print(f"{args.messages} messages indexed in {time.perf_counter() - t0:.1f} s, "
+          f"{per_message:.0f} B/message ({args.memory_sample}-message sample, tracemalloc)")
+
+    queries = [
+        ("account", None),
+        ("verify account", None),
+        ('"click here"', None),
+        ("zoom meeting tomorrow", None),
+        ("account", "scam"),
+        ("account", "likely scam"),
+        ("verify account", "likely scam"),
+        ('"click here"', "likely scam"),
+        ("", "suspicious"),
+    ]
+    for query, verdict in queries:
+        runs = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            hits = index.search(query, verdict)
+            runs.append(time.perf_counter() - t0)
+        label = query + (f" [verdict={verdict}]" if verdict else "")
+        print(f"  {label:40} {min(runs) * 1000:7.2f} ms  ({len(hits)} shown)")
+
+
+def bench_lookalike(args):
+    import random
+    import string
+
+    from lookalike import LookalikeIndex, load_brands
+
+    index = LookalikeIndex(load_brands())
+    rnd = random.Random(0)
+    brands = sorted(index.brands)
+    hosts = []
+    for i in range(args.hosts):
+        if i % 4 == 0:  # a quarter are lookalikes, some punycode
+            brand = rnd.choice(brands).replace("o", "0").replace("a", "а", 1)
+            hosts.append(brand.encode("idna").decode("ascii") if i % 8 == 0 else brand)
+        else:
+            name = "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(5, 12)))
+            hosts.append(f"www.{name}.com")
+
+    t0 = time.perf_counter()
+    hits = sum(index.check(h) is not None for h in hosts)
+    cold = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for h in hosts:
+        index.check(h)
+    warm = time.perf_counter() - t0
+
+    print(f"{len(hosts)} hosts vs {len(brands)} protected brands, {hits} flagged")
+    print(f"  first sight  {cold / len(hosts) * 1e6:6.2f} us/host")
+    print(f"  cached       {warm / len(hosts) * 1e6:6.2f} us/host")
+
+
+def bench_typosquat(args):
+    import os
+    import random
+    import string
+    import tempfile
+
+    from typosquat import MIN_LABEL_LENGTH, TyposquatIndex
+
+    rnd = random.Random(0)
+    brands = {
+        "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(5, 14))) + ".com"
+        for _ in range(args.brands)
+    }
+    path = os.path.join(tempfile.mkdtemp(), "typosquat.index")
+
+    t0 = time.perf_counter()
+    index = TyposquatIndex.build(brands)
+    build = time.perf_counter() - t0
+    index.save(path)
+    t0 = time.perf_counter()
+    index = TyposquatIndex.load_or_build(brands, path)
+    load = time.perf_counter() - t0
+
+    # brands whose label keeps MIN_LABEL_LENGTH letters after a typo, so
+    # nearly every typo host below is flagged (swapping two equal letters
+    # is no typo)
+    labels = [b[:-4] for b in sorted(brands) if len(b) - 4 > MIN_LABEL_LENGTH]
+    hosts = []
+    for i in range(args.hosts):
+        label = rnd.choice(labels)
+        if i % 2 == 0:  # typo: drop, double or swap a character
+            j = rnd.randrange(len(label) - 1)
+            label = rnd.choice([
+                label[:j] + label[j + 1:],
+                label[:j] + label[j] + label[j:],
+                label[:j] + label[j + 1] + label[j] + label[j + 2:],
+            ])
+        else:
+            label = "".join(rnd.choices(string.ascii_lowercase, k=len(label)))
+        hosts.append(label + "-support.net")
+
+    t0 = time.perf_counter()
+    flagged = [index.closest(h) is not None for h in hosts]
+    per_host = (time.perf_counter() - t0) / len(hosts)
+    typos, random_hits = sum(flagged[0::2]), sum(flagged[1::2])
+
+    print(f"{len(brands)} brands: {len(index.deletes)} deletion keys, "
+          f"built in {build:.2f} s, loaded in {load:.2f} s ({os.path.getsize(path) / 2**20:.1f} MiB)")
+    print(f"{len(hosts)} hosts: {typos} of {len(flagged[0::2])} typos flagged, "
+          f"{random_hits} of {len(flagged[1::2])} random labels: {per_host * 1e6:.1f} us/host")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scam detector benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("stream", help="TTFB / time-to-interactive of the inbox page")
+    p.add_argument("--messages", type=int, default=5000)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--cold", action="store_true",
+                   help="don't wait for scan-at-ingest to finish before measuring")
+    p.set_defaults(func=bench_stream)
+
+    p = sub.add_parser("memory", help="bytes per message of the in-memory mailbox")
+    p.add_argument("--messages", type=int, default=100000)
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("burst", help="per-message cost and detection delay of the burst tracker")
+    p.add_argument("--messages", type=int, default=200000)
+    p.add_argument("--domains", type=int, default=5000)
+    p.add_argument("--share", type=float, default=0.05,
+                   help="fraction of messages carrying the campaign domain once it starts")
+    p.set_defaults(func=bench_burst)
+
+    p = sub.add_parser("search", help="index memory and query latency of the inbox search")
+    p.add_argument("--messages", type=int, default=1_000_000)
+    p.add_argument("--memory-sample", type=int, default=20000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_search)
+
+    p = sub.add_parser("lookalike", help="per-host cost of the homoglyph check")
+    p.add_argument("--hosts", type=int, default=50000)
+    p.set_defaults(func=bench_lookalike)
+
+    p = sub.add_parser("typosquat", help="build/load time and per-host cost of the typosquat index")
+    p.add_argument("--brands", type=int, default=30000)
+    p.add_argument("--hosts", type=int, default=20000)
+    p.set_defaults(func=bench_typosquat)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import math
+import time
+
+# Wall-clock time budgets for analysis. A budget is just a deadline; a
+# per-message budget created under a per-request one never outlives it.
+
+
+class Budget:
+    def __init__(self, ms=None, parent=None):
+        self.deadline = math.inf if ms is None else time.monotonic() + ms / 1000
+        if parent is not None:
+            self.deadline = min(self.deadline, parent.deadline)
+
+    def remaining(self) -> float:
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def timeout(self):
+        # for blocking calls: None means wait indefinitely
+        return None if self.deadline == math.inf else self.remaining()
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
@@ -0,0 +1,236 @@
+import mmap
+import multiprocessing
+import struct
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Streaming burst detection over sender domains and URL hosts.
+#
+# Counts live in count-min sketches, one per time slot, kept in a ring of
+# SLOTS slots plus a running total of the whole ring. A key's "recent"
+# count is the last RECENT_SLOTS slots (the current, partial one included);
+# its baseline is the rest of the ring, scaled to the same length. A key
+# is bursting when it is both frequent (MIN_BURST_COUNT) and far above its
+# baseline (BURST_RATIO), which is what a brand-new campaign domain looks
+# like. A short heavy-hitters list keeps the top keys by recent count for
+# display.
+#
+# Memory is fixed: (SLOTS + 2) * DEPTH * WIDTH 32-bit counters plus TOP_K
+# keys (and a bounded cache of key hashes), whatever the traffic.
+#
+# Counters, ring position and heavy hitters all live in one anonymous
+# shared mapping, guarded by a process-shared lock, so the pre-fork
+# server's workers count into (and read) the same sketches. The mapping
+# belongs to the process that created the tracker: a restart that re-execs
+# it starts counting from zero. Heavy-hitter keys longer than KEY_BYTES
+# (UTF-8) are counted but not listed.
+
+WIDTH = 2048
+DEPTH = 4
+SLOT_SECONDS = 60
+SLOTS = 30
+RECENT_SLOTS = 2
+TOP_K = 20
+
+KEY_BYTES = 255
+
+MIN_BURST_COUNT = 50
+BURST_RATIO = 10.0
+
+# shared header: slot and first slot (-1: none yet), heavy hitters stored,
+# their generation (bumped on every change) and the count floor for entry
+_HEADER = struct.Struct("qqqqq")
+_KEY = struct.Struct(f"B{KEY_BYTES}s")  # length, UTF-8 key
+
+
+def is_burst(count, score):
+    return count >= MIN_BURST_COUNT and score >= BURST_RATIO
+
+
+@lru_cache(maxsize=1 << 16)
+def _cells(key, width, depth):
+    # double hashing: depth counter positions from one hash
+    h = hash(key)
+    h1 = h & 0xFFFFFFFF
+    h2 = (h >> 32) | 1
+    return tuple(row * width + (h1 + row * h2) % width for row in range(depth))
+
+
+class BurstTracker:
+    def __init__(self, width=WIDTH, depth=DEPTH, slot_seconds=SLOT_SECONDS, slots=SLOTS,
+                 top_k=TOP_K, clock=time.monotonic):
+        self.width = width
+        self.depth = depth
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        self.top_k = top_k
+        self.clock = clock
+
+        cells = width * depth
+        counters = (slots + 2) * cells * 4
+        self._mem = mmap.mmap(-1, _HEADER.size + counters + top_k * _KEY.size)  # MAP_SHARED
+        view = memoryview(self._mem)
+        self._header = view[:_HEADER.size]
+        sketches = view[_HEADER.size:_HEADER.size + counters].cast("I")
+        self._keys = view[_HEADER.size + counters:]
+        self._zero = memoryview(bytes(4 * cells)).cast("I")
+        self._ring = [sketches[i * cells:(i + 1) * cells] for i in range(slots)]
+        self._total = sketches[slots * cells:(slots + 1) * cells]
+        self._recent = sketches[(slots + 1) * cells:]  # sum of the last RECENT_SLOTS slots
+        self._lock = multiprocessing.Lock()
+        _HEADER.pack_into(self._header, 0, -1, -1, 0, 0, 0)
+
+        # this process's copy of the shared state, refreshed under the lock
+        self._slot = self._started = None
+        self._heavy = []
+        self._generation = -1
+        self._floor = 0
+        self._dirty = False
+
+    @contextmanager
+    def _locked(self, now):
+        # hold the shared lock with the ring advanced to now
+        with self._lock:
+            self._load()
+            self._advance(now)
+            try:
+                yield
+            finally:
+                self._store()
+
+    def _load(self):
+        slot, started, n, generation, self._floor = _HEADER.unpack_from(self._header)
+        self._slot = None if slot < 0 else slot
+        self._started = None if started < 0 else started
+        if generation != self._generation:
+            heavy = []
+            for i in range(n):
+                size, key = _KEY.unpack_from(self._keys, i * _KEY.size)
+                heavy.append(key[:size].decode("utf-8"))
+            self._heavy = heavy
+            self._generation = generation
+        self._dirty = False
+
+    def _store(self):
+        if self._dirty:
+            self._generation += 1
+            for i, key in enumerate(self._heavy):
+                data = key.encode("utf-8")
+                _KEY.pack_into(self._keys, i * _KEY.size, len(data), data)
+        _HEADER.pack_into(
+            self._header, 0,
+            -1 if self._slot is None else self._slot,
+            -1 if self._started is None else self._started,
+            len(self._heavy), self._generation, self._floor,
+        )
+
+    def _cells(self, key):
+        return _cells(key, self.width, self.depth)
+
+    def _advance(self, now):
+        slot = int(now // self.slot_seconds)
+        if self._slot is None:
+            self._slot = self._started = slot
+            return
+        if slot <= self._slot:
+            return
+        steps = min(slot - self._slot, self.slots)
+        total = self._total
+        for s in range(self._slot + 1, self._slot + 1 + steps):
+            old = self._ring[s % self.slots]
+            for i, n in enumerate(old):
+                if n:
+                    total[i] -= n
+            old[:] = self._zero
+        self._slot = slot
+        recent = self._recent
+        recent[:] = self._zero
+        for j in range(1, RECENT_SLOTS):
+            for i, n in enumerate(self._ring[(slot - j) % self.slots]):
+                if n:
+                    recent[i] += n
+        # recent counts only shrink on rotation; drop the heavy hitters that emptied
+        counts = {k: self._recent_count(self._cells(k)) for k in self._heavy}
+        self._heavy = [k for k in self._heavy if counts[k]]
+        self._floor = min(counts[k] for k in self._heavy) if len(self._heavy) >= self.top_k else 0
+        self._dirty = True
+
+    def _recent_count(self, cells):
+        return min(map(self._recent.__getitem__, cells))
+
+    def _estimate(self, cells):
+        # (recent count, expected count for the same span from the baseline)
+        recent = self._recent_count(cells)
+        older = min(map(self._total.__getitem__, cells)) - recent
+        history = min(self._slot - self._started + 1, self.slots) - RECENT_SLOTS
+        if history <= 0:
+            return recent, None  # still warming up: no baseline yet
+        return recent, max(older, 0) * RECENT_SLOTS / history
+
+    def observe(self, keys, now=None):
+        # count each distinct key of one message once
+        now = self.clock() if now is None else now
+        with self._locked(now):
+            current = self._ring[self._slot % self.slots]
+            total, recent = self._total, self._recent
+            for key in set(keys):
+                cells = self._cells(key)
+                for c in cells:
+                    current[c] += 1
+                    total[c] += 1
+                    recent[c] += 1
+                self._rank(key, self._recent_count(cells))
+
+    def _rank(self, key, count):
+        heavy = self._heavy
+        if key in heavy or len(key.encode("utf-8")) > KEY_BYTES:
+            return
+        if len(heavy) < self.top_k:
+            heavy.append(key)
+            self._dirty = True
+        elif count > self._floor:
+            # counts only grow between rotations, so the floor goes stale
+            # upwards; re-read them before evicting
+            counts = [self._recent_count(self._cells(k)) for k in heavy]
+            lowest = min(range(len(heavy)), key=counts.__getitem__)
+            if counts[lowest] < count:
+                heavy[lowest] = key
+                counts[lowest] = count
+                self._dirty = True
+            self._floor = min(counts)
+
+    def _score(self, key):
+        # (recent count, recent / expected); score is 0.0 while warming up
+        recent, expected = self._estimate(self._cells(key))
+        if expected is None:
+            return recent, 0.0
+        return recent, recent / (expected + 1)
+
+    def score(self, key, now=None):
+        now = self.clock() if now is None else now
+        with self._locked(now):
+            return self._score(key)
+
+    def check(self, keys, now=None):
+        # the strongest burst among keys as (key, count, score), or None
+        now = self.clock() if now is None else now
+        best = None
+        with self._locked(now):
+            for key in set(keys):
+                count, score = self._score(key)
+                if is_burst(count, score):
+                    if best is None or score > best[2]:
+                        best = (key, count, score)
+        return best
+
+    def heavy_hitters(self, now=None):
+        # [(key, recent count, score)], most frequent first
+        now = self.clock() if now is None else now
+        with self._locked(now):
+            keys = list(self._heavy)
+        out = [(key, *self.score(key, now)) for key in keys]
+        return sorted((h for h in out if h[1]), key=lambda h: -h[1])
+
+    def bursting(self, now=None):
+        return [h for h in self.heavy_hitters(now) if is_burst(h[1], h[2])]
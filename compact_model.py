@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import re
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+
+# Compact stand-in for the pickled TfidfVectorizer + LogisticRegression pair.
+#
+# The vocabulary dict and stop word list are replaced by a sorted array of
+# 64-bit token hashes: stop words and unknown tokens simply never match.
+# Each known token keeps its idf (needed for the l2 norm) and a weight that
+# is either float32 or int8 with a single scale factor. Weights whose
+# magnitude is below `prune` * max|w| are zeroed before quantization.
+#
+# File layout: MAGIC, uint32 header length, JSON header, then the raw arrays
+# at 8-byte aligned offsets so the loader can memory-map them in place.
+
+COMPACT_MODEL_PATH = "spam_model.compact"
+
+MAGIC = b"SPAMCMP1"
+
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _check_vectorizer(vectorizer):
+    params = vectorizer.get_params()
+    expected = {
+        "analyzer": "word",
+        "lowercase": True,
+        "ngram_range": (1, 1),
+        "norm": "l2",
+        "use_idf": True,
+        "sublinear_tf": False,
+        "binary": False,
+        "strip_accents": None,
+        "preprocessor": None,
+        "tokenizer": None,
+        "token_pattern": TOKEN_PATTERN.pattern,
+    }
+    for key, value in expected.items():
+        if params.get(key) != value:
+            raise ValueError(f"compact export does not support {key}={params.get(key)!r}")
+
+
+def export_compact(clf, vectorizer, path=COMPACT_MODEL_PATH, dtype="int8", prune=0.01):
+    _check_vectorizer(vectorizer)
+    if clf.coef_.shape[0] != 1:
+        raise ValueError("compact export supports binary classifiers only")
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    hashes = np.array([token_hash(t) for t in terms], dtype=np.uint64)
+    if len(np.unique(hashes)) != len(hashes):
+        raise ValueError("token hash collision in vocabulary")
+
+    weights = clf.coef_.ravel().astype(np.float64)
+    max_w = float(np.abs(weights).max()) or 1.0
+    weights[np.abs(weights) < prune * max_w] = 0.0
+
+    if dtype == "int8":
+        scale = max_w / 127.0
+        weights = np.clip(np.round(weights / scale), -127, 127).astype(np.int8)
+    elif dtype == "float32":
+        scale = 1.0
+        weights = weights.astype(np.float32)
+    else:
+        raise ValueError(f"unsupported dtype: {dtype!r}")
+
+    order = np.argsort(hashes)
+    arrays = {
+        "hashes": hashes[order],
+        "idf": vectorizer.idf_[order].astype(np.float32),
+        "weights": weights[order],
+    }
+    header = {
+        "scale": scale,
+        "intercept": float(clf.intercept_[0]),
+        "classes": [str(c) for c in clf.classes_],
+        "arrays": {},
+    }
+    offset = 0
+    for name, arr in arrays.items():
+        header["arrays"][name] = {"dtype": arr.dtype.str, "count": len(arr), "offset": offset}
+        offset += -(-arr.nbytes // 8) * 8
+
+    raw_header = json.dumps(header).encode("utf-8")
+    raw_header += b" " * (-(len(MAGIC) + 4 + len(raw_header)) % 8)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(raw_header).to_bytes(4, "little"))
+        f.write(raw_header)
+        start = f.tell()
+        for name, arr in arrays.items():
+            f.seek(start + header["arrays"][name]["offset"])
+            f.write(arr.tobytes())
+    return path
+
+
+class CompactModel:
+    def __init__(self, hashes, idf, weights, scale, intercept, classes):
+        self.hashes = hashes
+        self.idf = idf
+        self.weights = weights
+        self.scale = float(scale)
+        self.intercept = float(intercept)
+        self.classes_ = classes
+
+    def decision_function(self, texts):
+        out = np.empty(len(texts), dtype=np.float64)
+        for i, text in enumerate(texts):
+            counts = Counter(TOKEN_PATTERN.findall(text.lower()))
+            if not counts:
+                out[i] = self.intercept
+                continue
+            keys = np.fromiter((token_hash(t) for t in counts), dtype=np.uint64, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            pos = np.searchsorted(self.hashes, keys)
+            pos[pos == len(self.hashes)] = 0
+            hit = self.hashes[pos] == keys
+            pos, tf = pos[hit], tf[hit]
+
+            x = tf * self.idf[pos]
+            norm = np.sqrt(np.dot(x, x))
+            if norm == 0.0:
+                out[i] = self.intercept
+                continue
+            w = self.weights[pos].astype(np.float64) * self.scale
+            out[i] = np.dot(x, w) / norm + self.intercept
+        return out
+
+    def predict(self, texts):
+        return self.classes_[(self.decision_function(texts) > 0).astype(np.intp)]
+
+
+def load_compact(path=COMPACT_MODEL_PATH):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a compact model file")
+        header_len = int.from_bytes(f.read(4), "little")
+        header = json.loads(f.read(header_len))
+        start = f.tell()
+
+    arrays = {
+        name: np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r",
+                        offset=start + spec["offset"], shape=(spec["count"],))
+        for name, spec in header["arrays"].items()
+    }
+    return CompactModel(
+        arrays["hashes"], arrays["idf"], arrays["weights"],
+        header["scale"], header["intercept"], np.array(header["classes"]),
+    )
+
+
+def measure_load(loader):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    obj = loader()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, elapsed, peak
+
+
+def compare_models(clf_path, vec_path, compact_path, texts, labels):
+    import joblib
+
+    (clf, vectorizer), full_load, full_mem = measure_load(
+        lambda: (joblib.load(clf_path), joblib.load(vec_path))
+    )
+    compact, compact_load, compact_mem = measure_load(lambda: load_compact(compact_path))
+
+    labels = np.asarray(labels).astype(str)
+    full_pred = np.asarray(clf.predict(vectorizer.transform(texts))).astype(str)
+    compact_pred = compact.predict(texts)
+
+    full_acc = float(np.mean(full_pred == labels))
+    compact_acc = float(np.mean(compact_pred == labels))
+    return {
+        "full_size_bytes": os.path.getsize(clf_path) + os.path.getsize(vec_path),
+        "compact_size_bytes": os.path.getsize(compact_path),
+        "full_load_ms": full_load * 1000,
+        "compact_load_ms": compact_load * 1000,
+        "full_memory_bytes": full_mem,
+        "compact_memory_bytes": compact_mem,
+        "full_accuracy": full_acc,
+        "compact_accuracy": compact_acc,
+        "accuracy_delta": compact_acc - full_acc,
+        "agreement": float(np.mean(full_pred == compact_pred)),
+    }
@@ -1,8 +1,71 @@
-from flask import Flask, request, redirect, url_for, render_template_string
+from flask import (Flask, Response, jsonify, request, redirect, url_for, render_template_string,
+                   stream_template_string, stream_with_context)
+import hashlib
+import itertools
+import os
 import re
+from email.utils import parseaddr
 from urllib.parse import urlparse
 
+from budget import Budget
+from burst import BurstTracker
+from inbox_stream import StreamedAnalyses, chunked
+from ingest import Scanner
+from lookalike import BRANDS_PATH, HOMOGLYPH, LookalikeIndex, hostname, load_brands, registrable_domain
+from message_store import PENDING_VERDICT, MessageStore, Verdict
+from scan_api import NDJSON, BadMessage, RequestTooLarge, read_request, scan, scan_lines
+from search_index import SearchIndex
+from typosquat import WORDS_PATH, TyposquatIndex, load_words
+from user_actions import ACTIONS_PATH, ActionStore
+
+try:
+    from compact_model import COMPACT_MODEL_PATH, load_compact
+except ImportError:  # numpy not installed: rule checks only
+    COMPACT_MODEL_PATH, load_compact = None, None
+
 app = Flask(__name__)
+app.config.setdefault("STREAM_INBOX", False)
+# time budgets in milliseconds; None disables the limit
+app.config.setdefault("MESSAGE_BUDGET_MS", 50)
+app.config.setdefault("REQUEST_BUDGET_MS", 1000)
+# report/spam marks database; persists across restarts
+app.config.setdefault("USER_ACTIONS_PATH", os.environ.get("USER_ACTIONS_PATH", ACTIONS_PATH))
+
+# under a budget, messages beyond these sizes get their expensive stages deferred
+MAX_QUICK_URLS = 1000
+MAX_DEEP_URLS = 50
+# URLs per message counted and checked for bursts, budget or not
+MAX_BURST_URLS = 50
+MAX_MODEL_CHARS = 100_000
+
+# optional ML model; memory-mapped, so forked workers share its pages
+MODEL = None
+MODEL_VERSION = None
+MODEL_STAMP = None  # (mtime, size) of the loaded file, to notice a retrain
+
+
+def _model_stamp():
+    if load_compact is None:
+        return None
+    try:
+        st = os.stat(COMPACT_MODEL_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def reload_model():
+    global MODEL, MODEL_VERSION, MODEL_STAMP
+    MODEL_STAMP = _model_stamp()
+    if load_compact is not None and os.path.exists(COMPACT_MODEL_PATH):
+        with open(COMPACT_MODEL_PATH, "rb") as f:
+            MODEL_VERSION = hashlib.sha256(f.read()).hexdigest()[:12]
+        MODEL = load_compact(COMPACT_MODEL_PATH)
+    else:
+        MODEL, MODEL_VERSION = None, None
+
+
+reload_model()
 
 BLACKLISTED_DOMAINS = {
     "badsite.ru",
@@ -10,10 +73,20 @@ BLACKLISTED_DOMAINS = {
     "malware-download.net",
 }
 
+PROTECTED_BRANDS = set(load_brands(BRANDS_PATH)) if os.path.exists(BRANDS_PATH) else set()
+LOOKALIKES = LookalikeIndex(PROTECTED_BRANDS)
+TYPOSQUATS = TyposquatIndex.load_or_build(
+    PROTECTED_BRANDS, words=load_words() if os.path.exists(WORDS_PATH) else ()
+)
+# sender domains / URL hosts seen recently, counted once per incoming message
+BURSTS = BurstTracker()
+
 SUSPICIOUS_TLDS = {
     ".ru", ".cn", ".tk", ".xyz", ".top", ".club", ".work"
 }
 
+VERDICTS = ("scam", "likely scam", "suspicious", "probably safe")
+
 SCAM_KEYWORDS = {
     "urgent",
     "verify your account",
@@ -43,7 +116,21 @@ def get_domain(url: str) -> str:
     return urlparse(url).netloc.lower()
 
 
-def check_url_safety(url: str) -> str:
+def message_domains(urls, sender=None):
+    # registrable domains a message is counted under for burst detection;
+    # only its first MAX_BURST_URLS distinct URLs count
+    urls = itertools.islice(dict.fromkeys(urls), MAX_BURST_URLS)
+    domains = {registrable_domain(hostname(get_domain(u))) for u in urls}
+    if sender:
+        addr = parseaddr(sender)[1]
+        if "@" in addr:
+            domains.add(registrable_domain(hostname(addr)))
+    domains.discard("")
+    return domains
+
+
+def quick_url_check(url: str) -> str:
+    # set lookups and string tests only; always runs
     domain = get_domain(url)
 
     if domain in BLACKLISTED_DOMAINS:
@@ -62,16 +149,91 @@ def check_url_safety(url: str) -> str:
     return "safe"
 
 
+def deep_url_check(url: str):
+    # brand lookalike / typosquat analysis; skipped when out of budget
+    domain = get_domain(url)
+
+    lookalike = LOOKALIKES.check(domain)
+    if lookalike is not None:
+        # homoglyph of a protected brand → phishing; other mixed-script hosts are only suspicious
+        return "malicious" if lookalike[0] == HOMOGLYPH else "suspicious"
+
+    if TYPOSQUATS.closest(domain) is not None:
+        return "suspicious"
+
+    return None
+
+
+def check_url_safety(url: str) -> str:
+    quick = quick_url_check(url)
+    if quick == "malicious":
+        return quick
+    deep = deep_url_check(url)
+    if deep == "malicious" or quick == "safe":
+        return deep or quick
+    return quick
+
+
 def contains_scam_keywords(text: str) -> bool:
     lowered = text.lower()
     return any(kw in lowered for kw in SCAM_KEYWORDS)
 
 
-def analyze_email(subject: str, body: str):
+def matched_scam_keywords(text: str):
+    lowered = text.lower()
+    return sorted(kw for kw in SCAM_KEYWORDS if kw in lowered)
+
+
+def scan_version() -> str:
+    h = hashlib.sha256()
+    for rules in (BLACKLISTED_DOMAINS, PROTECTED_BRANDS, SUSPICIOUS_TLDS, SCAM_KEYWORDS):
+        h.update("\n".join(sorted(rules)).encode("utf-8") + b"\0")
+    return f"rules-{h.hexdigest()[:12]}/model-{MODEL_VERSION}"
+
+
+def analyze_email(subject: str, body: str, budget=None, sender=None, max_quick_urls=MAX_QUICK_URLS):
+    # Cheap checks first. With a budget, the expensive stages (deep URL
+    # analysis, ML scoring) are skipped once it runs out and the result is
+    # marked partial so the scanner can finish it in the background. The
+    # cheap URL checks always run, even past the deadline, but only on the
+    # first max_quick_urls distinct URLs (None: all of them) when there is
+    # a budget.
     full = subject + "\n" + body
     urls = extract_urls(full)
-    url_results = {u: check_url_safety(u) for u in urls}
-    has_keywords = contains_scam_keywords(full)
+    skipped = []
+    url_results = {}
+    for u in urls:
+        if budget is not None and max_quick_urls is not None and len(url_results) >= max_quick_urls:
+            skipped.append("quick_urls")
+            break
+        if u not in url_results:
+            url_results[u] = quick_url_check(u)
+    matched_keywords = matched_scam_keywords(full)
+    has_keywords = bool(matched_keywords)
+    burst = None
+    if budget is not None and budget.expired():
+        skipped.append("burst")
+    else:
+        burst = BURSTS.check(message_domains(urls, sender))
+
+    checked = 0
+    for u in url_results:
+        if url_results[u] == "malicious":
+            continue
+        if budget is not None and (budget.expired() or checked >= MAX_DEEP_URLS):
+            skipped.append("deep_urls")
+            break
+        deep = deep_url_check(u)
+        if deep == "malicious" or (deep and url_results[u] == "safe"):
+            url_results[u] = deep
+        checked += 1
+
+    spam_model = None
+    if MODEL is not None:
+        if budget is not None and (budget.expired() or len(full) > MAX_MODEL_CHARS):
+            skipped.append("spam_model")
+        else:
+            spam_model = str(MODEL.predict([full])[0])
 
     if any(v == "malicious" for v in url_results.values()):
         overall = "scam"
@@ -82,14 +244,14 @@ def analyze_email(subject: str, body: str):
     else:
         overall = "probably safe"
 
-    return {
-        "overall": overall,
-        "urls": url_results,
-        "has_scam_keywords": has_keywords,
-    }
+    if burst is not None and overall in ("suspicious", "probably safe"):
+        # part of a sudden campaign: one step worse than the message alone
+        overall = VERDICTS[VERDICTS.index(overall) - 1]
+
+    return Verdict(overall, url_results, matched_keywords, spam_model, skipped, burst=burst)
 
 # Test cases
-EMAILS = [
+SAMPLE_EMAILS = [
     {
         "id": 1,
         "name": "Inbox 1",
@@ -196,13 +358,51 @@ EMAILS = [
 ]
 
 
+EMAILS = MessageStore()
+
+
 def get_email(email_id: int):
-    for e in EMAILS:
-        if e["id"] == email_id:
-            return e
-    return None
+    return EMAILS.get(email_id)
+
+
+SEARCH_INDEX = SearchIndex()
+
+SCANNER = Scanner(
+    analyze_email,
+    scan_version(),
+    on_scanned=lambda e, analysis: SEARCH_INDEX.set_verdict(e.id, analysis.overall),
+    make_budget=lambda: Budget(app.config["MESSAGE_BUDGET_MS"]),
+)
+
+
+def add_email(e):
+    # ingest: count, store, index now, scan once in the background
+    BURSTS.observe(message_domains(extract_urls(e["subject"] + "\n" + e["body"]), e.get("sender")))
+    msg = EMAILS.add(e["id"], e["name"], e["subject"], e["body"])
+    SEARCH_INDEX.add(msg.id, e["subject"], e["body"])
+    SCANNER.submit(msg)
+    return msg
+
+
+def current_scan_version():
+    # reloads the model first if its file changed since it was loaded
+    if _model_stamp() != MODEL_STAMP:
+        reload_model()
+    return scan_version()
 
 
+def refresh_scan_version():
+    # call after changing rules or the model file; queues stale rescans.
+    # The scanner also polls current_scan_version(), so a retrained model
+    # is picked up on its own within VERSION_CHECK_SECONDS.
+    reload_model()
+    return SCANNER.set_version(scan_version(), EMAILS)
+
+
+for _e in SAMPLE_EMAILS:
+    add_email(_e)
+
+SCANNER.watch_version(current_scan_version, EMAILS)
 
 
 TEMPLATE = """
@@ -363,6 +563,15 @@ TEMPLATE = """
             gap: 10px;
         }
 
+        .search-box select,
+        .search-box button {
+            border: none;
+            background: transparent;
+            color: #5a4c7c;
+            font-size: 14px;
+            cursor: pointer;
+        }
+
         .search-box input {
             border: none;
             background: transparent;
@@ -476,6 +685,10 @@ TEMPLATE = """
             background: #fce8e6;
             color: #c5221f;
         }
+        .risk-pending {
+            background: #eeeeee;
+            color: #777777;
+        }
 
         /* Detail panel */
         .detail {
@@ -670,17 +883,34 @@ TEMPLATE = """
                     </span>
                 </div>
             </div>
+
+            {% if trending %}
+            <div>
+                <div class="section-title">Bursting</div>
+                {% for domain, count, score in trending %}
+                <div class="nav-item">
+                    <span class="left">{{ domain }}</span>
+                    <span class="nav-count">{{ count }}</span>
+                </div>
+                {% endfor %}
+            </div>
+            {% endif %}
         </aside>
 
         <!-- Center content -->
         <section class="center">
             <div class="top-bar">
                 <div class="menu-icon">☰</div>
-                <div class="search-box">
-                    <span>Hinted search text</span>
-                    <input type="text" placeholder="" />
-                    <span>🔍</span>
-                </div>
+                <form class="search-box" method="get" action="{{ url_for('inbox') }}">
+                    <input type="text" name="q" value="{{ query }}" placeholder="Hinted search text" />
+                    <select name="verdict">
+                        <option value="">Any verdict</option>
+                        {% for v in verdicts %}
+                            <option value="{{ v }}" {% if v == verdict %}selected{% endif %}>{{ v }}</option>
+                        {% endfor %}
+                    </select>
+                    <button type="submit">🔍</button>
+                </form>
                 <div class="profile-badge">👤</div>
             </div>
 
@@ -693,6 +923,7 @@ TEMPLATE = """
             <div class="list-panel">
                 <!-- Email list -->
                 <div class="email-list">
+                    {% if stream %}{{ analyses.flush() }}{% endif %}
                     {% for email in emails %}
                     {% set analysis = analyses[email.id] %}
                     {% set overall = analysis.overall %}
@@ -705,23 +936,29 @@ TEMPLATE = """
                     {% elif overall == 'suspicious' %}
                         {% set tag_class = 'risk-suspicious' %}
                         {% set tag_text = 'Suspicious' %}
+                    {% elif overall == 'pending' %}
+                        {% set tag_class = 'risk-pending' %}
+                        {% set tag_text = 'Scanning…' %}
                     {% else %}
                         {% set tag_class = 'risk-safe' %}
                         {% set tag_text = 'Safe' %}
                     {% endif %}
-                    <a href="{{ url_for('inbox', email_id=email.id) }}" style="text-decoration:none;">
+                    <a href="{{ url_for('inbox', email_id=email.id, q=query or None, verdict=verdict) }}" style="text-decoration:none;">
                         <div class="row {% if selected and selected.id == email.id %}selected{% endif %}">
                             <div class="check-cell">
                                 <div class="checkbox"></div>
                             </div>
                             <div class="row-title">
                                 <span>{{ email.name }}</span>
-                                <span class="risk-tag {{ tag_class }}">{{ tag_text }}</span>
+                                <span class="risk-tag {{ tag_class }}" id="tag-{{ email.id }}">{{ tag_text }}</span>
                             </div>
                         </div>
                     </a>
+                    {% else %}
+                    <div style="color:#777;font-size:14px;padding:16px;">No messages match your search.</div>
                     {% endfor %}
                 </div>
+                {% if stream %}{{ analyses.flush() }}{% endif %}
 
                 <!-- Detail panel -->
                 <div class="detail">
@@ -740,6 +977,18 @@ TEMPLATE = """
                         ">
                             Verdict: {{ overall }}
                         </div>
+                        {% if ana.partial %}
+                            <div class="detail-meta">Partial verdict: {{ ana.skipped|join(', ') }} still running.</div>
+                        {% endif %}
+                        {% if ana.matched_keywords %}
+                            <div class="detail-meta">Matched rules: {{ ana.matched_keywords|join(', ') }}</div>
+                        {% endif %}
+                        {% if ana.spam_model %}
+                            <div class="detail-meta">ML model: {{ ana.spam_model }}</div>
+                        {% endif %}
+                        {% if ana.burst %}
+                            <div class="detail-meta">Burst: {{ ana.burst[0] }} in {{ ana.burst[1] }} messages in the last few minutes ({{ '%.0f'|format(ana.burst[2]) }}× its usual rate)</div>
+                        {% endif %}
 
                         <div class="detail-urls">
                             {% if ana.urls %}
@@ -785,6 +1034,10 @@ TEMPLATE = """
         </section>
     </div>
 
+    {% if stream %}
+        {% for patch in analyses.late_patches() %}{{ patch|safe }}{% endfor %}
+    {% endif %}
+
     {% if toast_type == 'reported' %}
 <div id="toast" class="toast show">
     <span>Email #{{ toast_email_id }} reported as scam.</span>
@@ -830,36 +1083,87 @@ TEMPLATE = """
 </html>
 """
 
-REPORTED = set()
-SPAM = set()
+# shared by every serve.py worker, unlike the rest of this module's state;
+# opened on first use so app.config can point it elsewhere before that
+_ACTION_STORES = {}
+
+
+def user_actions():
+    path = app.config["USER_ACTIONS_PATH"]
+    store = _ACTION_STORES.get(path)
+    if store is None:
+        store = _ACTION_STORES[path] = ActionStore(path)
+    return store
+
+# action -> (mark, set it?, action that undoes it)
+ACTIONS = {
+    "report": ("reported", True, "undo_report"),
+    "spam": ("spam", True, "undo_spam"),
+    "undo_report": ("reported", False, "report"),
+    "undo_spam": ("spam", False, "spam"),
+}
+MAX_BULK_IDS = 100_000
+
+
+def apply_action(act, email_ids):
+    # one batched state update; returns the ids whose state actually changed,
+    # so undoing exactly those restores the previous state
+    kind, add, _ = ACTIONS[act]
+    return user_actions().update(kind, email_ids, add)
 
 
 @app.route("/", methods=["GET"])
 def inbox():
+    query = request.args.get("q", "").strip()
+    verdict = request.args.get("verdict") or None
+    if query or verdict:
+        emails = [get_email(i) for i in SEARCH_INDEX.search(query, verdict)]
+    else:
+        emails = EMAILS
+
     email_id = request.args.get("email_id", type=int)
-    if email_id is None:
-        email_id = EMAILS[0]["id"]
+    if email_id is None and emails:
+        email_id = emails[0].id
 
     selected = get_email(email_id)
-
-
-    analyses = {}
-    for e in EMAILS:
-        analyses[e["id"]] = analyze_email(e["subject"], e["body"])
+    shown = [*emails, selected] if selected else list(emails)
 
     toast_type = request.args.get("toast")
     toast_email_id = request.args.get("toast_email_id", type=int)
 
-    return render_template_string(
-        TEMPLATE,
-        emails=EMAILS,
+    stream = request.args.get("stream", type=int)
+    if stream is None:
+        stream = app.config["STREAM_INBOX"]
+
+    if selected:
+        SCANNER.touch([email_id])
+    if stream:
+        futures = {e.id: SCANNER.future(e) for e in shown}
+        analyses = StreamedAnalyses(futures, blocking=[email_id] if selected else [])
+    else:
+        # only never-scanned messages wait, and only until the request budget runs out
+        budget = Budget(app.config["REQUEST_BUDGET_MS"])
+        analyses = {}
+        for e in shown:
+            analyses[e.id] = SCANNER.result(e, timeout=budget.timeout()) or PENDING_VERDICT
+
+    context = dict(
+        emails=emails,
         selected=selected,
+        query=query,
+        verdict=verdict,
+        verdicts=VERDICTS,
         analyses=analyses,
-        reported=REPORTED,
-        spam=SPAM,
+        trending=BURSTS.bursting()[:5],
+        reported=user_actions().marked("reported", [email_id]) if selected else set(),
+        spam=user_actions().marked("spam", [email_id]) if selected else set(),
         toast_type=toast_type,
         toast_email_id=toast_email_id,
+        stream=bool(stream),
     )
+    if stream:
+        return Response(chunked(stream_template_string(TEMPLATE, **context), analyses))
+    return render_template_string(TEMPLATE, **context)
 
 
 @app.route("/action", methods=["POST"])
@@ -869,7 +1173,7 @@ def action():
 
     # REPORT
     if act == "report":
-        REPORTED.add(email_id)
+        apply_action("report", {email_id})
         print(f"[REPORT] Email {email_id} reported as scam.")
         return redirect(url_for(
             "inbox",
@@ -880,7 +1184,7 @@ def action():
 
     # SPAM
     elif act == "spam":
-        SPAM.add(email_id)
+        apply_action("spam", {email_id})
         print(f"[SPAM] Email {email_id} moved to spam.")
         return redirect(url_for(
             "inbox",
@@ -891,8 +1195,7 @@ def action():
 
     # UNDO REPORT
     elif act == "undo_report":
-        if email_id in REPORTED:
-            REPORTED.discard(email_id)
+        if apply_action("undo_report", {email_id}):
             print(f"[UNDO] Report removed for email {email_id}.")
         return redirect(url_for(
             "inbox",
@@ -903,8 +1206,7 @@ def action():
 
     # UNDO SPAM
     elif act == "undo_spam":
-        if email_id in SPAM:
-            SPAM.discard(email_id)
+        if apply_action("undo_spam", {email_id}):
             print(f"[UNDO] Spam removed for email {email_id}.")
         return redirect(url_for(
             "inbox",
@@ -915,5 +1217,72 @@ def action():
 
     return redirect(url_for("inbox", email_id=email_id))
 
+
+@app.route("/api/v1/actions", methods=["POST"])
+def bulk_action():
+    # {"action": ..., "ids": [...]} or {"action": ..., "select": {"q": ..., "verdict": ...}}
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="expected a JSON object"), 400
+    act = payload.get("action")
+    if act not in ACTIONS:
+        return jsonify(error=f"unknown action: {act!r}"), 400
+
+    if "ids" in payload:
+        ids = payload["ids"]
+        if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+            return jsonify(error="ids must be a list of integers"), 400
+    elif isinstance(payload.get("select"), dict):
+        query = str(payload["select"].get("q") or "").strip()
+        verdict = payload["select"].get("verdict")
+        if verdict is not None and verdict not in VERDICTS:
+            return jsonify(error=f"unknown verdict: {verdict!r}"), 400
+        if not query and not verdict:
+            return jsonify(error="select needs q and/or verdict"), 400
+        ids = SEARCH_INDEX.search(query, verdict, limit=None)
+    else:
+        return jsonify(error="expected ids or select"), 400
+    if len(ids) > MAX_BULK_IDS:
+        return jsonify(error=f"at most {MAX_BULK_IDS} ids per request"), 413
+
+    requested = set(ids)
+    known = {i for i in requested if i in EMAILS}
+    changed = apply_action(act, known)
+    print(f"[BULK] {act}: {len(changed)} of {len(known)} emails changed.")
+    return jsonify(
+        action=act,
+        matched=len(known),
+        changed=len(changed),
+        unknown=len(requested) - len(known),
+        undo={"action": ACTIONS[act][2], "ids": sorted(changed)},
+    )
+
+@app.route("/api/v1/analyze", methods=["POST"])
+def api_analyze():
+    # one JSON message -> one JSON verdict; batches and NDJSON -> NDJSON stream
+    try:
+        messages, is_batch = read_request(request)
+    except (RequestTooLarge, BadMessage) as e:
+        return jsonify(error=str(e)), e.status
+
+    version = SCANNER.version
+    request_budget = Budget(app.config["REQUEST_BUDGET_MS"])
+
+    def analyze(subject, body, sender=None):
+        # a slow message can't starve the rest: the budgets only gate the
+        # deep URL, burst and ML stages. Nothing finishes an API verdict
+        # later, so every URL gets the quick checks.
+        budget = Budget(app.config["MESSAGE_BUDGET_MS"], parent=request_budget)
+        BURSTS.observe(message_domains(extract_urls(subject + "\n" + body), sender))
+        verdict = analyze_email(subject, body, budget=budget, sender=sender, max_quick_urls=None)
+        verdict.version = version
+        return verdict
+
+    if not is_batch:
+        result = scan(messages[0], analyze)
+        return jsonify(result), result.get("status", 200)
+    return Response(stream_with_context(scan_lines(messages, analyze)), mimetype=NDJSON)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
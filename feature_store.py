@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+# Persisted TF-IDF features, one CSR row per message.
+#
+# Layout of <root>/<vectorizer version>/:
+#   data.f32     float32 values   (CSR data)
+#   indices.i32  int32 columns    (CSR indices)
+#   indptr.i32   int32 row starts (CSR indptr, always starts with 0)
+#   ids.txt      one message id per row
+#   meta.json    vectorizer version and feature count
+#
+# Rows are append-only. indptr is written last on every append, so a crash
+# halfway through leaves trailing bytes in the other files; reopening
+# truncates them back to what indptr covers before anything new is written.
+
+DEFAULT_ROOT = "feature_store"
+
+_DATA = "data.f32"
+_INDICES = "indices.i32"
+_INDPTR = "indptr.i32"
+_IDS = "ids.txt"
+_META = "meta.json"
+
+
+def vectorizer_version(vectorizer) -> str:
+    h = hashlib.sha256()
+    for term, idx in sorted(vectorizer.vocabulary_.items()):
+        h.update(f"{term}\0{idx}\n".encode("utf-8"))
+    h.update(np.asarray(vectorizer.idf_, dtype=np.float64).tobytes())
+    params = vectorizer.get_params()
+    params.pop("dtype", None)
+    h.update(repr(sorted(params.items())).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _load_array(path, dtype):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class FeatureStore:
+    def __init__(self, vectorizer, root=DEFAULT_ROOT):
+        self.vectorizer = vectorizer
+        self.version = vectorizer_version(vectorizer)
+        self.n_features = len(vectorizer.vocabulary_)
+        self.path = os.path.join(root, self.version)
+        os.makedirs(self.path, exist_ok=True)
+
+        meta_path = os.path.join(self.path, _META)
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w") as f:
+                json.dump({"version": self.version, "n_features": self.n_features}, f)
+            np.zeros(1, dtype=np.int32).tofile(os.path.join(self.path, _INDPTR))
+
+        self._recover()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _truncate(self, name, size):
+        path = self._file(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    def _recover(self):
+        # once, on open: drop whatever a crashed append left past indptr
+        # (a torn indptr write can leave half an entry)
+        self._truncate(_INDPTR, os.path.getsize(self._file(_INDPTR)) // 4 * 4)
+        n_rows = os.path.getsize(self._file(_INDPTR)) // 4 - 1
+        nnz = int(_load_array(self._file(_INDPTR), np.int32)[-1])
+
+        self._truncate(_DATA, nnz * 4)
+        self._truncate(_INDICES, nnz * 4)
+        with open(self._file(_IDS), "a+b") as f:
+            f.seek(0)
+            lines = f.read().split(b"\n")
+        self.ids = [line.decode("utf-8") for line in lines[:n_rows]]
+        self._truncate(_IDS, sum(len(line) + 1 for line in lines[:n_rows]))
+        self._row_of = {msg_id: row for row, msg_id in enumerate(self.ids)}
+        self._map()
+
+    def _map(self):
+        # (re)map the CSR arrays after they grew
+        self._indptr = _load_array(self._file(_INDPTR), np.int32)
+        nnz = int(self._indptr[-1])
+        self._data = _load_array(self._file(_DATA), np.float32)[:nnz]
+        self._indices = _load_array(self._file(_INDICES), np.int32)[:nnz]
+        self._matrix = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, msg_id):
+        return str(msg_id) in self._row_of
+
+    def append(self, ids, texts):
+        # Messages are immutable, so ids already in the store are skipped
+        # rather than re-vectorized.
+        pending = {}
+        for msg_id, text in zip(ids, texts):
+            msg_id = str(msg_id)
+            if "\n" in msg_id:
+                raise ValueError(f"message id may not contain a newline: {msg_id!r}")
+            if msg_id not in self._row_of:
+                pending.setdefault(msg_id, text)
+        new = list(pending.items())
+        if not new:
+            return 0
+
+        X = self.vectorizer.transform([t for _, t in new]).tocsr()
+        X.sort_indices()
+        base = int(self._indptr[-1])
+        if base + X.nnz > np.iinfo(np.int32).max:
+            raise ValueError("feature store is full (int32 nnz limit reached)")
+
+        with open(self._file(_DATA), "ab") as f:
+            X.data.astype(np.float32).tofile(f)
+        with open(self._file(_INDICES), "ab") as f:
+            X.indices.astype(np.int32).tofile(f)
+        with open(self._file(_IDS), "a") as f:
+            f.writelines(msg_id + "\n" for msg_id, _ in new)
+        with open(self._file(_INDPTR), "ab") as f:
+            (X.indptr[1:] + base).astype(np.int32).tofile(f)
+
+        for msg_id, _ in new:
+            self._row_of[msg_id] = len(self.ids)
+            self.ids.append(msg_id)
+        self._map()
+        return len(new)
+
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = sp.csr_matrix(
+                (self._data, self._indices, self._indptr),
+                shape=(len(self.ids), self.n_features),
+                copy=False,
+            )
+        return self._matrix
+
+    def row(self, msg_id):
+        return self.matrix()[self._row_of[str(msg_id)]]
+
+    def scores(self, coef, intercept=0.0):
+        coef = np.asarray(coef, dtype=np.float32).ravel()
+        if coef.shape[0] != self.n_features:
+            raise ValueError(
+                f"classifier expects {coef.shape[0]} features, store has {self.n_features}"
+            )
+        return self.matrix() @ coef + np.float32(intercept)
+
+    def rescore(self, clf):
+        # Binary linear classifier only: one sparse mat-vec, no re-tokenizing.
+        scores = self.scores(clf.coef_, clf.intercept_[0])
+        labels = clf.classes_[(scores > 0).astype(np.intp)]
+        return dict(zip(self.ids, labels))
+
+
+if __name__ == "__main__":
+    import time
+
+    import joblib
+
+    from email_scam_ui import EMAILS
+
+    clf = joblib.load("spam_classifier.joblib")
+    vectorizer = joblib.load("vectorizer.joblib")
+
+    store = FeatureStore(vectorizer)
+    added = store.append(
+        [e.id for e in EMAILS],
+        [e.subject + " " + e.body for e in EMAILS],
+    )
+    print(f"Feature store {store.path}: {len(store)} rows ({added} new)")
+
+    t0 = time.perf_counter()
+    verdicts = store.rescore(clf)
+    elapsed = time.perf_counter() - t0
+    print(f"Re-scored {len(verdicts)} messages in {elapsed * 1000:.2f} ms")
+    for msg_id, label in verdicts.items():
+        print(f"  {msg_id}: {label}")
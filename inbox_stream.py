@@ -0,0 +1,78 @@
+import json
+import time
+from concurrent.futures import TimeoutError, as_completed
+
+from message_store import PENDING_VERDICT
+
+# Helpers for the streamed inbox page.
+#
+# The page is rendered with Flask's stream_template_string while analyses
+# run in the background. StreamedAnalyses is what the template indexes:
+# rows whose verdict is ready by the first-paint deadline render normally,
+# the rest render as "Scanning…" and are patched in later by small inline
+# scripts emitted from late_patches() as each verdict completes.
+# chunked() batches Jinja's many tiny string pieces into larger writes but
+# flushes early whenever the template has asked for it.
+
+FIRST_PAINT_SECONDS = 0.05
+CHUNK_SIZE = 8192
+
+VERDICT_TAGS = {
+    "scam": ("risk-scam", "Scam"),
+    "likely scam": ("risk-likely", "Likely scam"),
+    "suspicious": ("risk-suspicious", "Suspicious"),
+    "probably safe": ("risk-safe", "Safe"),
+}
+
+FILL_SCRIPT = """<script>
+function fillVerdict(id, cls, text) {
+    var tag = document.getElementById("tag-" + id);
+    if (tag) { tag.className = "risk-tag " + cls; tag.textContent = text; }
+}
+</script>"""
+
+
+class StreamedAnalyses:
+    def __init__(self, futures, blocking=(), first_paint=FIRST_PAINT_SECONDS):
+        self.futures = futures
+        self.blocking = set(blocking)
+        self.deadline = time.monotonic() + first_paint
+        self.late = []
+        self.flush_requested = False
+
+    def __getitem__(self, email_id):
+        future = self.futures[email_id]
+        if email_id in self.blocking or future.done():
+            return future.result()
+        try:
+            return future.result(timeout=max(self.deadline - time.monotonic(), 0))
+        except TimeoutError:
+            self.late.append(email_id)
+            return PENDING_VERDICT
+
+    def flush(self, text=""):
+        self.flush_requested = True
+        return text
+
+    def late_patches(self):
+        if not self.late:
+            return
+        yield self.flush(FILL_SCRIPT)
+        pending = {self.futures[i]: i for i in self.late}
+        for future in as_completed(pending):
+            cls, text = VERDICT_TAGS.get(future.result().overall, VERDICT_TAGS["probably safe"])
+            args = ", ".join(json.dumps(v) for v in (pending[future], cls, text))
+            yield self.flush(f"<script>fillVerdict({args})</script>")
+
+
+def chunked(pieces, analyses, size=CHUNK_SIZE):
+    buf, n = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        n += len(piece)
+        if n >= size or analyses.flush_requested:
+            analyses.flush_requested = False
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
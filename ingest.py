@@ -0,0 +1,197 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+# Scan-at-ingest worker pool.
+#
+# Every message is analyzed once, when it arrives, and the result is stored
+# on the message itself as message.analysis together with the scan
+# version (rules + model) that produced it. Page views only read that.
+# When the version changes, rescan_stale() queues every out-of-date message
+# behind new arrivals, most recently opened first. Stale verdicts stay
+# readable until their rescan lands. set_version() is the hook for an
+# explicit change; watch_version() polls a version source every
+# VERSION_CHECK_SECONDS from a background thread, so a retrained model
+# file is picked up without anyone calling it.
+#
+# Ingest scans run under make_budget(); a partial result (expensive stages
+# skipped) is stored right away and the message is queued again to be
+# finished without a budget, ahead of version rescans.
+#
+# Worker threads (and the version watcher) start lazily and the queue is
+# rebuilt after fork, so the pre-fork server's children each get their own
+# pool. A thread that holds a lock (the search index's, stdout's) while
+# the process forks leaves it held forever in the child, so the pre-fork
+# parent calls quiesce() first: version checks stop for good in that
+# process and it waits until no scan is queued or running.
+
+INGEST_PRIORITY = 0
+COMPLETE_PRIORITY = 1
+RESCAN_PRIORITY = 2
+
+VERSION_CHECK_SECONDS = 30
+
+
+def done_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class Scanner:
+    def __init__(self, analyze, version, workers=4, on_scanned=None, make_budget=None):
+        self.analyze = analyze
+        self.version = version
+        self.workers = workers
+        self.on_scanned = on_scanned
+        self.make_budget = make_budget
+        self.last_viewed = {}
+        self._watch = None
+        self._seq = itertools.count()
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.PriorityQueue()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._threads = []
+        self._watcher = None
+        self._watch_lock = threading.Lock()
+        self._paused = False
+        self._active = 0  # scans taken off the queue and not finished yet
+        self._idle = threading.Condition(self._lock)
+
+    def _ensure_threads(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._work, name="scanner", daemon=True)
+            t.start()
+            self._threads.append(t)
+        if self._watch is not None and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch_version, name="scan-version", daemon=True)
+            self._watcher.start()
+
+    def _watch_version(self):
+        source, emails, interval = self._watch
+        while True:
+            time.sleep(interval)
+            with self._watch_lock:
+                if self._paused:
+                    continue
+                try:
+                    version = source()
+                except Exception as exc:  # keep watching; the old version stays in force
+                    print(f"[scanner] version check failed: {exc!r}", flush=True)
+                    continue
+                self.set_version(version, emails)
+
+    def _work(self):
+        q = self._queue
+        while True:
+            priority, _, _, email, future = q.get()
+            with self._lock:
+                self._active += 1
+            try:
+                self._scan(priority, email, future)
+            finally:
+                with self._idle:
+                    self._active -= 1
+                    self._idle.notify_all()
+
+    def _scan(self, priority, email, future):
+        version = self.version
+        budget = None
+        if priority == INGEST_PRIORITY and self.make_budget is not None:
+            budget = self.make_budget()
+        analysis = None
+        try:
+            analysis = self.analyze(email.subject, email.body, budget=budget)
+            analysis.version = version
+            email.analysis = analysis
+            if self.on_scanned is not None:
+                self.on_scanned(email, analysis)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(analysis)
+        finally:
+            with self._lock:
+                if self._inflight.get(email.id) is future:
+                    del self._inflight[email.id]
+        if analysis is not None and analysis.partial:
+            self.submit(email, COMPLETE_PRIORITY)
+
+    def submit(self, email, priority=INGEST_PRIORITY, order=0.0):
+        with self._lock:
+            future = self._inflight.get(email.id)
+            if future is None:
+                future = Future()
+                self._inflight[email.id] = future
+                self._queue.put((priority, order, next(self._seq), email, future))
+                self._ensure_threads()
+        return future
+
+    def is_current(self, email):
+        analysis = email.analysis
+        return analysis is not None and analysis.version == self.version
+
+    def future(self, email):
+        # a stored verdict is returned even if stale; only unscanned
+        # messages make the caller wait
+        analysis = email.analysis
+        if analysis is not None:
+            return done_future(analysis)
+        return self.submit(email)
+
+    def result(self, email, timeout=None):
+        # None on timeout
+        try:
+            return self.future(email).result(timeout=timeout)
+        except TimeoutError:
+            return None
+
+    def touch(self, email_ids):
+        # record that these were opened; rescans go to them first
+        now = time.monotonic()
+        for email_id in email_ids:
+            self.last_viewed[email_id] = now
+        with self._lock:
+            self._ensure_threads()
+
+    def rescan_stale(self, emails):
+        stale = [e for e in emails if not self.is_current(e)]
+        for e in stale:
+            self.submit(e, RESCAN_PRIORITY, -self.last_viewed.get(e.id, 0.0))
+        return len(stale)
+
+    def set_version(self, version, emails):
+        with self._lock:
+            if version == self.version:
+                return 0
+            self.version = version
+        return self.rescan_stale(emails)
+
+    def watch_version(self, source, emails, interval=VERSION_CHECK_SECONDS):
+        # poll source() for the current version and rescan emails when it changes
+        self._watch = (source, emails, interval)
+        with self._lock:
+            self._ensure_threads()
+
+    def pending(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def quiesce(self, timeout=None):
+        # stop version checks in this process and wait until no scan is
+        # queued or running; False if that did not happen within timeout
+        with self._watch_lock:
+            self._paused = True
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._inflight and not self._active, timeout)
+
+    def start(self):
+        with self._lock:
+            self._ensure_threads()
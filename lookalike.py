@@ -0,0 +1,147 @@
+import unicodedata
+from functools import lru_cache
+
+# Homoglyph / IDN lookalike detection for URL hosts.
+#
+# Every protected brand label is reduced once, at startup, to a confusable
+# "skeleton" (NFKC, casefold, homoglyphs folded to one Latin representative,
+# a few multi-letter lookalikes such as "rn" -> "m"). A host is punycode-
+# decoded and reduced the same way, and a single dict lookup tells whether
+# it collides with a brand it isn't. Results are cached per host.
+#
+# Other labels mixing scripts are flagged unless the mix is one UTS #39
+# allows at its "highly restrictive" level: Han with Hiragana and Katakana
+# (Japanese), with Bopomofo (Chinese) or with Hangul (Korean), each
+# optionally with Latin.
+
+BRANDS_PATH = "protected_brands.txt"
+
+# second-level labels that are part of a country's public suffix (co.uk, ...)
+_SUFFIX_LABELS = {"co", "com", "net", "org", "gov", "ac", "edu"}
+
+# single characters -> Latin skeleton character (subset of Unicode
+# confusables.txt covering Cyrillic, Greek and digit lookalikes)
+CONFUSABLES = {
+    "0": "o", "1": "l", "3": "e", "5": "s", "|": "l",
+    "ı": "i", "ɩ": "i", "ǀ": "l",
+    # Cyrillic
+    "а": "a", "в": "b", "е": "e", "ё": "e", "һ": "h", "і": "i", "ї": "i",
+    "ј": "j", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p", "с": "c",
+    "ѕ": "s", "т": "t", "у": "y", "х": "x", "ԁ": "d", "ԛ": "q", "ԝ": "w",
+    "ӏ": "l", "ь": "b",
+    # Greek
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v",
+    "ο": "o", "ρ": "p", "τ": "t", "υ": "u", "χ": "x", "ω": "w",
+}
+
+# applied after the single-character pass
+CONFUSABLE_SEQUENCES = (("rn", "m"), ("vv", "w"))
+
+HOMOGLYPH = "homoglyph"
+MIXED_SCRIPT = "mixed-script"
+
+# first word of a character's Unicode name -> its script, where they differ
+_SCRIPT_NAMES = {
+    "CJK": "HAN",
+    "IDEOGRAPHIC": "HAN",  # 々 and friends
+    "KATAKANA-HIRAGANA": "KATAKANA",  # ー, used with either kana
+}
+
+ALLOWED_SCRIPT_MIXES = (
+    frozenset({"LATIN", "HAN", "HIRAGANA", "KATAKANA"}),
+    frozenset({"LATIN", "HAN", "BOPOMOFO"}),
+    frozenset({"LATIN", "HAN", "HANGUL"}),
+)
+
+
+def decode_label(label: str) -> str:
+    if label.startswith("xn--"):
+        try:
+            return label.encode("ascii").decode("idna")
+        except UnicodeError:
+            return label
+    return label
+
+
+def hostname(netloc: str) -> str:
+    host = netloc.rsplit("@", 1)[-1]
+    if host.startswith("["):  # IPv6 literal
+        return host
+    return host.split(":", 1)[0].rstrip(".").lower()
+
+
+def split_host(host: str):
+    # (registrable label, subdomain labels, suffix labels), decoded
+    labels = [decode_label(l) for l in host.split(".") if l]
+    if len(labels) < 2:
+        return (labels[0] if labels else ""), [], []
+    n_suffix = 1
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SUFFIX_LABELS:
+        n_suffix = 2
+    return labels[-n_suffix - 1], labels[:-n_suffix - 1], labels[-n_suffix:]
+
+
+def registrable_domain(host: str) -> str:
+    label, _, suffix = split_host(host)
+    return ".".join([label, *suffix])
+
+
+def skeleton(label: str) -> str:
+    folded = unicodedata.normalize("NFKC", label).casefold()
+    out = "".join(CONFUSABLES.get(ch, ch) for ch in folded)
+    for seq, repl in CONFUSABLE_SEQUENCES:
+        out = out.replace(seq, repl)
+    return out
+
+
+def scripts(label: str):
+    found = set()
+    for ch in unicodedata.normalize("NFKC", label):
+        if not ch.isalpha():
+            continue
+        name = unicodedata.name(ch, "")
+        script = name.split(" ", 1)[0] if name else "UNKNOWN"
+        found.add(_SCRIPT_NAMES.get(script, script))
+    return found
+
+
+def is_mixed_script(label: str) -> bool:
+    found = scripts(label)
+    return len(found) > 1 and not any(found <= allowed for allowed in ALLOWED_SCRIPT_MIXES)
+
+
+def load_brands(path=BRANDS_PATH):
+    brands = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip().lower()
+            if line and not line.startswith("#"):
+                brands.append(line)
+    return brands
+
+
+class LookalikeIndex:
+    def __init__(self, brands):
+        self.brands = frozenset(brands)
+        self.by_skeleton = {}
+        for brand in sorted(self.brands):
+            label, _, _ = split_host(brand)
+            self.by_skeleton.setdefault(skeleton(label), brand)
+        self.check = lru_cache(maxsize=65536)(self._check)
+
+    def _check(self, host):
+        # -> (kind, brand) or None
+        label, subdomains, suffix = split_host(hostname(host))
+        if not label:
+            return None
+        if ".".join([label] + suffix) in self.brands:
+            return None
+
+        for part in [label] + subdomains:
+            brand = self.by_skeleton.get(skeleton(part))
+            if brand is not None and split_host(brand)[0] != part:
+                return (HOMOGLYPH, brand)
+
+        if any(is_mixed_script(part) for part in [label] + subdomains):
+            return (MIXED_SCRIPT, None)
+        return None
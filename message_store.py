@@ -0,0 +1,173 @@
+import mmap
+import os
+import sys
+import tempfile
+import threading
+
+# Compact in-memory mailbox.
+#
+# Message and Verdict are __slots__ records instead of dicts. Verdict
+# strings are small-int codes into shared tuples, keyword/label strings are
+# the interned rule objects, and message bodies live in an append-only blob
+# file read back through mmap, so they only cost page cache until a body is
+# actually displayed or scanned.
+#
+# Each process appends to its own blob segment: after fork the child starts
+# a new one, while segments written before the fork stay readable (and
+# shared) through the inherited mappings.
+
+VERDICTS = ("scam", "likely scam", "suspicious", "probably safe", "pending")
+VERDICT_CODES = {v: i for i, v in enumerate(VERDICTS)}
+
+URL_STATUSES = ("safe", "suspicious", "malicious")
+URL_STATUS_CODES = {s: i for i, s in enumerate(URL_STATUSES)}
+
+
+class BlobSegment:
+    MIN_CAPACITY = 1 << 20
+
+    def __init__(self, directory=None):
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._size = 0
+        self._capacity = 0
+        self._map = None
+        self._lock = threading.Lock()
+
+    def append(self, data: bytes):
+        with self._lock:
+            offset = self._size
+            if offset + len(data) > self._capacity:
+                # grow the file geometrically so readers rarely need a remap
+                self._capacity = max(2 * self._capacity, offset + len(data), self.MIN_CAPACITY)
+                self._file.truncate(self._capacity)
+            self._file.seek(offset)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+        return offset
+
+    def read(self, offset, length) -> bytes:
+        if length == 0:
+            return b""
+        m = self._map
+        if m is None or offset + length > len(m):
+            with self._lock:
+                if self._map is None or len(self._map) < self._capacity:
+                    self._map = mmap.mmap(self._file.fileno(), self._capacity, access=mmap.ACCESS_READ)
+                m = self._map
+        return m[offset:offset + length]
+
+
+class BlobStore:
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.segment = BlobSegment(directory)
+        os.register_at_fork(after_in_child=self._new_segment)
+
+    def _new_segment(self):
+        self.segment = BlobSegment(self.directory)
+
+    def append(self, text: str):
+        data = text.encode("utf-8")
+        segment = self.segment
+        return segment, segment.append(data), len(data)
+
+
+class Message:
+    __slots__ = ("id", "name", "subject", "_segment", "_offset", "_length", "analysis")
+
+    def __init__(self, id, name, subject, segment, offset, length):
+        self.id = id
+        self.name = name
+        self.subject = subject
+        self._segment = segment
+        self._offset = offset
+        self._length = length
+        self.analysis = None
+
+    @property
+    def body(self) -> str:
+        return self._segment.read(self._offset, self._length).decode("utf-8")
+
+    def __repr__(self):
+        return f"<Message {self.id} {self.subject!r}>"
+
+
+class Verdict:
+    __slots__ = ("code", "_urls", "matched_keywords", "spam_model", "skipped", "version", "burst")
+
+    def __init__(self, overall, urls=None, matched_keywords=(), spam_model=None, skipped=(), version=None,
+                 burst=None):
+        self.code = VERDICT_CODES[overall]
+        # flat (url, status code, url, status code, ...)
+        self._urls = tuple(x for u, s in (urls or {}).items() for x in (u, URL_STATUS_CODES[s]))
+        self.matched_keywords = tuple(matched_keywords)
+        self.spam_model = sys.intern(spam_model) if spam_model is not None else None
+        self.skipped = tuple(skipped)
+        self.version = version
+        # (domain, recent count, score) when a domain in it is bursting
+        self.burst = burst
+
+    @property
+    def overall(self) -> str:
+        return VERDICTS[self.code]
+
+    @property
+    def urls(self):
+        u = self._urls
+        return {u[i]: URL_STATUSES[u[i + 1]] for i in range(0, len(u), 2)}
+
+    @property
+    def has_scam_keywords(self) -> bool:
+        return bool(self.matched_keywords)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.skipped)
+
+    def as_dict(self):
+        return {
+            "overall": self.overall,
+            "urls": self.urls,
+            "has_scam_keywords": self.has_scam_keywords,
+            "matched_keywords": list(self.matched_keywords),
+            "spam_model": self.spam_model,
+            "partial": self.partial,
+            "skipped": list(self.skipped),
+            "version": self.version,
+            "burst": self.burst and dict(zip(("domain", "count", "score"), self.burst)),
+        }
+
+
+PENDING_VERDICT = Verdict("pending", skipped=("scan",))
+
+
+class MessageStore:
+    def __init__(self, blob_dir=None):
+        self.blobs = BlobStore(blob_dir)
+        self._messages = []
+        self._by_id = {}
+
+    def add(self, id, name, subject, body):
+        if id in self._by_id:
+            raise ValueError(f"duplicate message id: {id!r}")
+        segment, offset, length = self.blobs.append(body)
+        msg = Message(id, name, subject, segment, offset, length)
+        self._messages.append(msg)
+        self._by_id[id] = msg
+        return msg
+
+    def get(self, id):
+        return self._by_id.get(id)
+
+    def __contains__(self, id):
+        return id in self._by_id
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
@@ -0,0 +1,157 @@
+import json
+import time
+
+# Helpers for the JSON scanning API (/api/v1/analyze).
+#
+# A request carries one message, a batch, or newline-delimited JSON:
+#
+#   {"id": 7, "subject": "...", "body": "...", "sender": "..."}  one message
+#   [{...}, {...}]  or  {"messages": [{...}, {...}]}            batch
+#   {...}\n{...}\n  with Content-Type: application/x-ndjson      streamed batch
+#
+# sender is optional and only feeds burst detection.
+#
+# Each message is scanned under its own time budget, nested in one for the
+# whole request. The quick URL checks (blacklist, TLDs, encoding) always
+# run; the expensive stages that don't fit are skipped and the verdict
+# comes back "partial", listing them in "skipped". API verdicts are not
+# finished later, and the summary counts how many were partial.
+#
+# Batches are answered as NDJSON, one line per message in input order,
+# written as soon as that message is scanned. NDJSON input is read line by
+# line while results go out, so neither side is buffered whole. The last
+# line is always {"summary": {...}} with counts and batch timing.
+#
+# Limits: MAX_REQUEST_BYTES of request body, MAX_MESSAGE_BYTES of
+# subject + body per message, MAX_BATCH_MESSAGES per request. A request
+# that is too large up front gets a plain 413; once results are streaming,
+# limit errors are reported in-band as {"error": ..., "status": 413}.
+
+NDJSON = "application/x-ndjson"
+
+MAX_REQUEST_BYTES = 16 * 2**20
+MAX_MESSAGE_BYTES = 2**20
+MAX_BATCH_MESSAGES = 10_000
+
+
+class RequestTooLarge(Exception):
+    status = 413
+
+
+class BadMessage(ValueError):
+    status = 400
+
+
+class MessageTooLarge(BadMessage):
+    status = 413
+
+
+def _check_length(request):
+    if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+        raise RequestTooLarge(f"request body exceeds {MAX_REQUEST_BYTES} bytes")
+
+
+def read_ndjson(stream):
+    total = 0
+    while True:
+        line = stream.readline(MAX_REQUEST_BYTES - total + 1)
+        if not line:
+            return
+        total += len(line)
+        if total > MAX_REQUEST_BYTES:
+            raise RequestTooLarge(f"request body exceeds {MAX_REQUEST_BYTES} bytes")
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise BadMessage(f"invalid JSON: {e}") from None
+
+
+def read_request(request):
+    # (messages, is_batch); messages is lazy for NDJSON
+    _check_length(request)
+    if request.mimetype == NDJSON:
+        return read_ndjson(request.stream), True
+
+    data = request.stream.read(MAX_REQUEST_BYTES + 1)
+    if len(data) > MAX_REQUEST_BYTES:
+        raise RequestTooLarge(f"request body exceeds {MAX_REQUEST_BYTES} bytes")
+    try:
+        payload = json.loads(data)
+    except ValueError as e:
+        raise BadMessage(f"invalid JSON: {e}") from None
+    if isinstance(payload, list):
+        return payload, True
+    if isinstance(payload, dict) and "messages" in payload:
+        if not isinstance(payload["messages"], list):
+            raise BadMessage('"messages" must be a list')
+        return payload["messages"], True
+    return [payload], False
+
+
+def parse_message(obj):
+    if not isinstance(obj, dict):
+        raise BadMessage("message must be a JSON object")
+    subject = obj.get("subject", "")
+    body = obj.get("body", "")
+    sender = obj.get("sender")
+    if not isinstance(subject, str) or not isinstance(body, str):
+        raise BadMessage("subject and body must be strings")
+    if sender is not None and not isinstance(sender, str):
+        raise BadMessage("sender must be a string")
+    if len(subject.encode("utf-8")) + len(body.encode("utf-8")) > MAX_MESSAGE_BYTES:
+        raise MessageTooLarge(f"message exceeds {MAX_MESSAGE_BYTES} bytes")
+    return subject, body, sender
+
+
+def scan(obj, analyze):
+    # one result dict; per-message problems become an error entry
+    t0 = time.perf_counter()
+    result = {"id": obj.get("id") if isinstance(obj, dict) else None}
+    try:
+        subject, body, sender = parse_message(obj)
+        result.update(analyze(subject, body, sender).as_dict())
+    except BadMessage as e:
+        result.update(error=str(e), status=e.status)
+    result["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return result
+
+
+def _line(obj):
+    return json.dumps(obj, separators=(",", ":")) + "\n"
+
+
+def scan_lines(messages, analyze):
+    t0 = time.perf_counter()
+    scanned = errors = partial = 0
+    aborted = False
+    try:
+        for index, obj in enumerate(messages):
+            if index >= MAX_BATCH_MESSAGES:
+                aborted = True
+                yield _line({"error": f"batch exceeds {MAX_BATCH_MESSAGES} messages", "status": 413})
+                break
+            result = scan(obj, analyze)
+            if "error" in result:
+                errors += 1
+            else:
+                scanned += 1
+                partial += bool(result.get("partial"))
+            yield _line({"index": index, **result})
+    except (RequestTooLarge, BadMessage) as e:
+        # the rest of a streamed body can't be trusted; stop here
+        aborted = True
+        yield _line({"error": str(e), "status": e.status})
+
+    elapsed = time.perf_counter() - t0
+    total = scanned + errors
+    yield _line({"summary": {
+        "messages": total,
+        "scanned": scanned,
+        "errors": errors,
+        "partial": partial,
+        "aborted": aborted,
+        "ms": round(elapsed * 1000, 3),
+        "ms_per_message": round(elapsed * 1000 / total, 3) if total else 0.0,
+    }})
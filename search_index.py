@@ -0,0 +1,413 @@
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+
+from message_store import VERDICTS
+
+# In-memory inverted index over message subject + body.
+#
+# Messages get internal doc numbers in arrival order, which is also their
+# recency rank. A term's postings are flat parallel arrays: doc numbers
+# (ascending), term frequencies, and all positions concatenated. Subject
+# and body share one position space with a gap between them, so a phrase
+# never matches across the boundary. A term seen in a single message is
+# kept as a plain tuple until it shows up again.
+#
+# Queries are ANDed terms and "quoted phrases", ranked with BM25, newer
+# messages first on ties. Ranking is block-max: every BLOCK postings, and
+# every SUPERBLOCK blocks, keep the largest tf and the shortest message they
+# contain, which bounds any BM25 score inside. The rarest term's postings
+# are walked newest first, a superblock or block at a time, and skipped
+# whenever that bound plus the other terms' bounds over the same doc range
+# can't beat the current k-th result. A common-term query touches a few
+# blocks instead of every posting.
+#
+# Each verdict also keeps the sorted doc numbers that currently have it.
+# A verdict filter is one more AND list: blocks whose doc range holds no
+# message with that verdict are skipped, and when the verdict is rarer than
+# every query term its list is walked instead (scoring each of its
+# messages against the terms), so a rare verdict on a common term costs
+# what the verdict costs.
+#
+# remove() leaves tombstones in the postings (document frequencies still
+# count them). Verdicts arrive from scanner threads, so all access goes
+# through one lock.
+
+TOKEN_RE = re.compile(r"\w+")
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+_FIELD_GAP = 2
+
+BLOCK = 128
+SUPERBLOCK = 64  # blocks
+MAX_TF = 255  # per (term, message): larger counts, and positions past it, are dropped
+
+VERDICT_CODES = {v: i for i, v in enumerate(VERDICTS, 1)}  # 0: no verdict
+
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+
+def parse_query(query: str):
+    terms, phrases = [], []
+    for phrase, word in QUERY_RE.findall(query or ""):
+        tokens = tokenize(phrase if phrase else word)
+        if len(tokens) > 1:
+            phrases.append(tokens)
+        terms.extend(tokens)
+    return terms, phrases
+
+
+class _Bounds:
+    # per block (or superblock): first doc number, max tf, min message length
+    __slots__ = ("first", "max_tf", "min_len", "pos_start")
+
+    def __init__(self, with_pos):
+        self.first = array("I")
+        self.max_tf = bytearray()
+        self.min_len = array("I")
+        self.pos_start = array("I") if with_pos else None
+
+    def add(self, start_new, doc, tf, length, pos_start=0):
+        if start_new:
+            self.first.append(doc)
+            self.max_tf.append(tf)
+            self.min_len.append(length)
+            if self.pos_start is not None:
+                self.pos_start.append(pos_start)
+        else:
+            if tf > self.max_tf[-1]:
+                self.max_tf[-1] = tf
+            if length < self.min_len[-1]:
+                self.min_len[-1] = length
+
+
+class _Postings:
+    __slots__ = ("docs", "tfs", "pos", "blocks", "supers")
+
+    def __init__(self):
+        self.docs = array("I")
+        self.tfs = bytearray()
+        self.pos = array("I")
+        self.blocks = None  # once longer than one block
+        self.supers = None  # once longer than one superblock
+
+    def append(self, doc, positions, lengths):
+        i = len(self.docs)
+        tf = len(positions)
+        if i == BLOCK:
+            self.blocks = self._bounds(BLOCK, lengths, True)
+        if i == BLOCK * SUPERBLOCK:
+            self.supers = self._bounds(BLOCK * SUPERBLOCK, lengths, False)
+        if self.blocks is not None:
+            self.blocks.add(i % BLOCK == 0, doc, tf, lengths[doc], len(self.pos))
+        if self.supers is not None:
+            self.supers.add(i % (BLOCK * SUPERBLOCK) == 0, doc, tf, lengths[doc])
+        self.docs.append(doc)
+        self.tfs.append(tf)
+        self.pos.extend(positions)
+
+    def _bounds(self, size, lengths, with_pos):
+        bounds = _Bounds(with_pos)
+        start = 0
+        for i, (doc, tf) in enumerate(zip(self.docs, self.tfs)):
+            bounds.add(i % size == 0, doc, tf, lengths[doc], start)
+            start += tf
+        return bounds
+
+    def positions(self, i):
+        if self.blocks is None:
+            start = sum(self.tfs[:i])
+        else:
+            b = i // BLOCK
+            start = self.blocks.pos_start[b] + sum(self.tfs[b * BLOCK:i])
+        return self.pos[start:start + self.tfs[i]]
+
+
+def _single(entry):
+    doc, *positions = entry
+    p = _Postings()
+    p.docs.append(doc)
+    p.tfs.append(len(positions))
+    p.pos.extend(positions)
+    return p
+
+
+class SearchIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.ids = []  # doc number -> doc id
+        self.docnum = {}  # doc id -> live doc number
+        self.lengths = array("I")
+        self.verdicts = bytearray()  # doc number -> verdict code, 0 when none or removed
+        self.by_verdict = {code: array("I") for code in VERDICT_CODES.values()}  # sorted doc numbers
+        self.alive = bytearray()
+        self.n_live = 0
+        self.total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.n_live
+
+    def add(self, doc_id, subject, body, verdict=None):
+        with self._lock:
+            if doc_id in self.docnum:
+                self.remove(doc_id)
+
+            positions = defaultdict(list)
+            tokens = tokenize(subject)
+            for pos, tok in enumerate(tokens):
+                positions[tok].append(pos)
+            offset = len(tokens) + _FIELD_GAP
+            body_tokens = tokenize(body)
+            for pos, tok in enumerate(body_tokens, offset):
+                positions[tok].append(pos)
+
+            doc = len(self.ids)
+            length = len(tokens) + len(body_tokens)
+            self.ids.append(doc_id)
+            self.docnum[doc_id] = doc
+            self.lengths.append(length)
+            self.verdicts.append(0)
+            self.alive.append(1)
+            self.n_live += 1
+            self.total_len += length
+
+            postings = self.postings
+            for tok, plist in positions.items():
+                plist = plist[:MAX_TF]
+                p = postings.get(tok)
+                if p is None:
+                    postings[tok] = (doc, *plist)
+                    continue
+                if type(p) is tuple:
+                    p = postings[tok] = _single(p)
+                p.append(doc, plist, self.lengths)
+            self.set_verdict(doc_id, verdict)
+
+    def remove(self, doc_id):
+        with self._lock:
+            doc = self.docnum.pop(doc_id, None)
+            if doc is None:
+                return
+            self._set_code(doc, 0)
+            self.alive[doc] = 0
+            self.n_live -= 1
+            self.total_len -= self.lengths[doc]
+
+    def set_verdict(self, doc_id, verdict):
+        with self._lock:
+            doc = self.docnum.get(doc_id)
+            if doc is not None:
+                self._set_code(doc, VERDICT_CODES[verdict] if verdict is not None else 0)
+
+    def _set_code(self, doc, code):
+        old = self.verdicts[doc]
+        if old == code:
+            return
+        if old:
+            docs = self.by_verdict[old]
+            del docs[bisect_left(docs, doc)]
+        if code:
+            # scans mostly finish in arrival order, so this lands near the end
+            insort(self.by_verdict[code], doc)
+        self.verdicts[doc] = code
+
+    def _plist(self, term):
+        p = self.postings.get(term)
+        return _single(p) if type(p) is tuple else p
+
+    def search(self, query, verdict=None, limit=50):
+        with self._lock:
+            terms, phrases = parse_query(query)
+            code = vdocs = None
+            if verdict:
+                code = VERDICT_CODES.get(verdict)
+                vdocs = self.by_verdict.get(code)
+                if not vdocs:
+                    return []
+
+            if not terms:
+                if vdocs is None:
+                    return []
+                # verdict filter only: newest first, straight off its list
+                newest = vdocs if limit is None else vdocs[-limit:]
+                return [self.ids[doc] for doc in reversed(newest)]
+
+            plists = {t: self._plist(t) for t in set(terms)}
+            if any(p is None for p in plists.values()):
+                return []
+            return _Query(self, plists, phrases, code, vdocs, limit).run()
+
+
+class _Query:
+    # one top-k evaluation; limit=None returns every match, ranked. The
+    # driver is the rarest term's postings, or the verdict list when that
+    # is rarer still (then rarest is None and every term is in others).
+
+    def __init__(self, index, plists, phrases, code, vdocs, limit):
+        self.index = index
+        self.phrases = [[plists[t] for t in phrase] for phrase in phrases]
+        self.code = code
+        self.vdocs = vdocs
+        self.limit = limit
+        self.heap = []
+        n_docs = max(index.n_live, 1)
+        avg_len = index.total_len / n_docs or 1.0
+        k1, b = index.k1, index.b
+        self.c0 = k1 * (1 - b)
+        self.c1 = k1 * b / avg_len
+        self.k1p1 = k1 + 1
+
+        ordered = sorted(plists.values(), key=lambda p: len(p.docs))
+        self.idf = {
+            id(p): math.log(1 + (n_docs - len(p.docs) + 0.5) / (len(p.docs) + 0.5))
+            for p in ordered
+        }
+        if vdocs is not None and len(vdocs) < len(ordered[0].docs):
+            self.rarest, self.others = None, ordered
+        else:
+            self.rarest, self.others = ordered[0], ordered[1:]
+
+    def upper_bound(self, tf, length, lo, hi):
+        # best possible score for docs in [lo, hi] given the driving term's
+        # (max tf, min length) there; None if some other list has no entry
+        # in the range at all (AND can't match). A match is in every term's
+        # postings, so its length is at least the largest of their minimums.
+        vdocs = self.vdocs
+        if vdocs is not None and self.rarest is not None:
+            i = bisect_left(vdocs, lo)
+            if i == len(vdocs) or vdocs[i] > hi:
+                return None
+        tfs = []
+        for p in self.others:
+            docs = p.docs
+            i = bisect_left(docs, lo)
+            if i == len(docs) or docs[i] > hi:
+                return None
+            if p.blocks is None:
+                j = bisect_right(docs, hi, i)
+                tfs.append(max(p.tfs[i:j]))
+                length = max(length, min(self.index.lengths[d] for d in docs[i:j]))
+            else:
+                first = p.blocks.first
+                i = max(bisect_right(first, lo) - 1, 0)
+                j = bisect_right(first, hi)
+                tfs.append(max(p.blocks.max_tf[i:j]))
+                length = max(length, min(p.blocks.min_len[i:j]))
+        # same float operations as score(), so a bound is never below a real score
+        norm = self.c0 + self.c1 * length
+        k1p1 = self.k1p1
+        total = 0.0
+        if self.rarest is not None:
+            total = self.idf[id(self.rarest)] * tf * k1p1 / (tf + norm)
+        for p, tf in zip(self.others, tfs):
+            total += self.idf[id(p)] * tf * k1p1 / (tf + norm)
+        return total
+
+    def beaten(self, bound, newest):
+        # True when nothing scoring at most bound, no newer than newest, can enter
+        heap = self.heap
+        return self.limit is not None and len(heap) >= self.limit and (bound, newest) <= heap[0]
+
+    def run(self):
+        p = self.rarest
+        if p is None:
+            # walk the verdict list a BLOCK at a time, bounded by the terms alone
+            docs = self.vdocs
+            for end in range(len(docs), 0, -BLOCK):
+                start = max(end - BLOCK, 0)
+                lo, hi = docs[start], docs[end - 1]
+                bound = self.upper_bound(0, 0, lo, hi)
+                if bound is not None and not self.beaten(bound, hi):
+                    self.score(start, end)
+        elif p.supers is not None:
+            n = len(p.docs)
+            sb = BLOCK * SUPERBLOCK
+            for s in range(len(p.supers.first) - 1, -1, -1):
+                lo, hi = p.supers.first[s], p.docs[min((s + 1) * sb, n) - 1]
+                if self.prune(p.supers, s, lo, hi):
+                    continue
+                self.walk_blocks(range(min((s + 1) * SUPERBLOCK, len(p.blocks.first)) - 1, s * SUPERBLOCK - 1, -1))
+        elif p.blocks is not None:
+            self.walk_blocks(range(len(p.blocks.first) - 1, -1, -1))
+        else:
+            self.score(0, len(p.docs))
+
+        ranked = sorted(self.heap, reverse=True)
+        ids = self.index.ids
+        return [ids[doc] for _, doc in ranked]
+
+    def prune(self, bounds, i, lo, hi):
+        bound = self.upper_bound(bounds.max_tf[i], bounds.min_len[i], lo, hi)
+        return bound is None or self.beaten(bound, hi)
+
+    def walk_blocks(self, blocks):
+        p = self.rarest
+        n = len(p.docs)
+        for blk in blocks:
+            start, end = blk * BLOCK, min((blk + 1) * BLOCK, n)
+            if not self.prune(p.blocks, blk, p.docs[start], p.docs[end - 1]):
+                self.score(start, end)
+
+    def score(self, start, end):
+        # score driver entries [start, end)
+        index = self.index
+        lengths, alive = index.lengths, index.alive
+        heap, limit = self.heap, self.limit
+        c0, c1, k1p1 = self.c0, self.c1, self.k1p1
+        p = self.rarest
+        verdicts, code = index.verdicts, self.code
+        if p is None:
+            docs, tfs, idf_r = self.vdocs, None, 0.0
+            code = None  # the list is the filter
+        else:
+            docs, tfs, idf_r = p.docs, p.tfs, self.idf[id(p)]
+        others = [(o.docs, o.tfs, self.idf[id(o)]) for o in self.others]
+        cursors = [bisect_left(o.docs, docs[start]) for o in self.others]
+
+        for k in range(start, end):
+            doc = docs[k]
+            if not alive[doc] or (code is not None and verdicts[doc] != code):
+                continue
+            norm = c0 + c1 * lengths[doc]
+            score = 0.0
+            if tfs is not None:
+                tf = tfs[k]
+                score = idf_r * tf * k1p1 / (tf + norm)
+            matched = True
+            for n, (odocs, otfs, idf) in enumerate(others):
+                i = bisect_left(odocs, doc, cursors[n])
+                cursors[n] = i
+                if i == len(odocs) or odocs[i] != doc:
+                    matched = False
+                    break
+                tf = otfs[i]
+                score += idf * tf * k1p1 / (tf + norm)
+            if not matched:
+                continue
+            entry = (score, doc)
+            if limit is not None and len(heap) >= limit and entry <= heap[0]:
+                continue
+            if self.phrases and not all(self.has_phrase(doc, phrase) for phrase in self.phrases):
+                continue
+            if limit is None or len(heap) < limit:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heapreplace(heap, entry)
+
+    @staticmethod
+    def has_phrase(doc, phrase):
+        found = []
+        for p in phrase:
+            i = bisect_left(p.docs, doc)
+            found.append(set(p.positions(i)))
+        starts, rest = found[0], found[1:]
+        return any(all(start + i in pos for i, pos in enumerate(rest, 1)) for start in starts)
@@ -0,0 +1,224 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from werkzeug.serving import make_server
+
+import email_scam_ui
+
+# Pre-fork server for email_scam_ui.
+#
+# The parent imports the app (rules, compiled regexes, ML model), binds the
+# listening socket and then forks the workers, which all accept() on that
+# socket. gc.freeze() runs before each fork so the children's garbage
+# collector never writes to the inherited objects and their pages stay
+# shared copy-on-write. The compact model is memory-mapped, so its pages
+# come from the page cache and are shared either way.
+#
+# A lock held by another thread at fork time stays held in the child, so
+# before forking the parent quiesces the background scanner: no scan is
+# queued or running, and its version watcher stops checking (for good in
+# the parent, which also forks the replacement workers). Each worker
+# starts its own scanner threads.
+#
+# Everything in email_scam_ui is therefore a per-worker copy. The mailbox,
+# search index and rules are loaded before the fork and never written over
+# HTTP, and scan results are a cache each worker fills the same way. State
+# that requests do change lives outside the process: report/spam marks in
+# SQLite (user_actions.py), burst counters in shared memory (burst.py).
+#
+# Signals (to the parent):
+#   SIGHUP   graceful restart: re-exec the parent (so every module is loaded
+#            fresh, with no leftover threads, at-fork hooks or temp files),
+#            fork new workers on the same socket, then let the old ones
+#            finish their in-flight request and exit
+#   SIGUSR1  print the per-worker memory report
+#   SIGTERM  graceful shutdown (SIGINT too)
+
+# handed across the re-exec on SIGHUP
+LISTEN_FD_ENV = "SERVE_LISTEN_FD"
+RETIRING_ENV = "SERVE_RETIRING"
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def warm_up():
+    # fault in everything a request would lazily build, before forking
+    email_scam_ui.app.test_client().get("/")
+
+
+def read_smaps(pid):
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in SMAPS_FIELDS:
+                    usage[key] = int(rest.split()[0])
+    except OSError:
+        return None
+    return usage
+
+
+def format_report(pids):
+    lines = [f"{'pid':>8} " + " ".join(f"{k:>14}" for k in SMAPS_FIELDS) + "  (kB)"]
+    for pid in pids:
+        usage = read_smaps(pid)
+        if usage is None:
+            lines.append(f"{pid:>8}  (gone)")
+            continue
+        lines.append(f"{pid:>8} " + " ".join(f"{usage.get(k, 0):>14}" for k in SMAPS_FIELDS))
+    return "\n".join(lines)
+
+
+def run_worker(sock, app):
+    for sig in (signal.SIGHUP, signal.SIGUSR1, signal.SIGINT):
+        signal.signal(sig, signal.SIG_IGN)
+
+    host, port = sock.getsockname()
+    server = make_server(host, port, app, fd=sock.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever() to return, so it can't run
+        # on the thread that is inside serve_forever()
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    server.serve_forever()
+    os._exit(0)
+
+
+class Master:
+    def __init__(self, host, port, workers):
+        self.workers = workers
+        fd = os.environ.pop(LISTEN_FD_ENV, None)
+        if fd is not None:
+            self.sock = socket.socket(fileno=int(fd))
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.sock.bind((host, port))
+            self.sock.listen(128)
+        self.sock.set_inheritable(True)
+        self.children = set()
+        # workers of the previous generation, if we were re-exec'd
+        retiring = os.environ.pop(RETIRING_ENV, "")
+        self.retiring = {int(pid) for pid in retiring.split(",") if pid}
+        self.pending = []
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                email_scam_ui.SCANNER.start()
+                run_worker(self.sock, email_scam_ui.app)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(1)
+        self.children.add(pid)
+        return pid
+
+    def spawn_all(self):
+        warm_up()
+        email_scam_ui.SCANNER.quiesce()
+        gc.collect()
+        gc.freeze()
+        return [self.spawn() for _ in range(self.workers)]
+
+    def retire(self):
+        for pid in self.retiring:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def restart(self):
+        # don't exec into code that can't even import; keep serving instead
+        check = subprocess.run([sys.executable, os.path.abspath(__file__), "--check"])
+        if check.returncode != 0:
+            print("[serve] restart aborted: email_scam_ui failed to import", flush=True)
+            return
+        print(f"[serve] restarting, retiring {sorted(self.children)}", flush=True)
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        os.environ[RETIRING_ENV] = ",".join(str(pid) for pid in self.children | self.retiring)
+        os.execv(sys.executable, [sys.executable, *sys.argv])
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif pid in self.children:
+                self.children.discard(pid)
+                print(f"[serve] worker {pid} died (status {status}), respawning", flush=True)
+                self.spawn()
+
+    def shutdown(self):
+        for pid in self.children | self.retiring:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in self.children | self.retiring:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.sock.close()
+
+    def run(self):
+        for sig in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda signum, frame: self.pending.append(signum))
+
+        self.spawn_all()
+        self.retire()
+        host, port = self.sock.getsockname()
+        print(f"[serve] parent {os.getpid()} on http://{host}:{port}, "
+              f"workers {sorted(self.children)}", flush=True)
+
+        while True:
+            while self.pending:
+                signum = self.pending.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self.shutdown()
+                    return
+                if signum == signal.SIGHUP:
+                    self.restart()
+                elif signum == signal.SIGUSR1:
+                    print(format_report([os.getpid()] + sorted(self.children)), flush=True)
+            self.reap()
+            time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server for the scam detector UI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--check", action="store_true", help="only check that the app imports")
+    args = parser.parse_args()
+    if args.check:
+        return
+
+    if not hasattr(os, "fork"):
+        print("ERROR: serve.py needs os.fork (POSIX only)", file=sys.stderr)
+        sys.exit(1)
+
+    Master(args.host, args.port, args.workers).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import hashlib
+import queue
+import random
+import sys
+import threading
+import time
+
+# Shadow evaluation of a candidate model on live traffic.
+#
+# offer() is called on the request path after the live model has answered.
+# It samples, then hands the message to a background thread with a bounded,
+# non-blocking queue (a full queue drops the sample rather than slow the
+# caller). The thread scores it with the candidate and appends one CSV line:
+#
+#   unix_time,message_hash,live_label,shadow_label,live_us,shadow_us
+#
+# The message itself is never logged, only a short hash of it.
+
+LOG_PATH = "shadow_log.csv"
+
+
+def message_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=6).hexdigest()
+
+
+class ShadowEvaluator:
+    def __init__(self, predict, sample_rate=0.05, log_path=LOG_PATH, max_pending=1000):
+        self.predict = predict
+        self.sample_rate = sample_rate
+        self.log_path = log_path
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def offer(self, text, live_label, live_seconds):
+        if random.random() >= self.sample_rate:
+            return False
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._work, name="shadow", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((time.time(), text, live_label, live_seconds))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _work(self):
+        with open(self.log_path, "a", buffering=1) as log:
+            while True:
+                ts, text, live_label, live_seconds = self._queue.get()
+                t0 = time.perf_counter()
+                try:
+                    shadow_label = str(self.predict([text])[0])
+                except Exception as e:
+                    shadow_label = f"error:{type(e).__name__}"
+                shadow_seconds = time.perf_counter() - t0
+                log.write(f"{ts:.3f},{message_hash(text)},{live_label},{shadow_label},"
+                          f"{live_seconds * 1e6:.0f},{shadow_seconds * 1e6:.0f}\n")
+                self._queue.task_done()
+
+    def drain(self):
+        self._queue.join()
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(log_path=LOG_PATH):
+    pairs = {}
+    live_us, shadow_us = [], []
+    with open(log_path) as f:
+        for line in f:
+            parts = line.rstrip("\n").split(",")
+            if len(parts) != 6:
+                continue
+            _, _, live, shadow, l_us, s_us = parts
+            pairs[(live, shadow)] = pairs.get((live, shadow), 0) + 1
+            live_us.append(float(l_us))
+            shadow_us.append(float(s_us))
+
+    total = len(live_us)
+    disagreements = sum(n for (live, shadow), n in pairs.items() if live != shadow)
+    latency = {}
+    for p in (50, 95, 99):
+        live, shadow = _percentile(live_us, p), _percentile(shadow_us, p)
+        latency[f"p{p}"] = {"live_us": live, "shadow_us": shadow, "delta_us": shadow - live}
+    return {
+        "samples": total,
+        "disagreements": disagreements,
+        "disagreement_rate": disagreements / total if total else 0.0,
+        "pairs": {f"{live}->{shadow}": n for (live, shadow), n in sorted(pairs.items())},
+        "latency": latency,
+    }
+
+
+if __name__ == "__main__":
+    report = summarize(sys.argv[1] if len(sys.argv) > 1 else LOG_PATH)
+    print(f"Shadow samples: {report['samples']}, disagreements: {report['disagreements']} "
+          f"({report['disagreement_rate']:.2%})")
+    for pair, n in report["pairs"].items():
+        print(f"  {pair}: {n}")
+    for p, lat in report["latency"].items():
+        print(f"  {p}: live {lat['live_us']:.0f} us, shadow {lat['shadow_us']:.0f} us "
+              f"(delta {lat['delta_us']:+.0f} us)")
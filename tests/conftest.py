@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# the app is a set of top-level modules, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# keep report/spam marks made by tests out of the working copy's database
+os.environ.setdefault("USER_ACTIONS_PATH", os.path.join(tempfile.mkdtemp(), "user_actions.db"))
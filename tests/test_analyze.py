@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import email_scam_ui as ui
+from budget import Budget
+
+BAD = "Click here to restore access: http://badsite.ru/login and https://example.com/help"
+
+
+def test_unbudgeted_scan_is_complete():
+    verdict = ui.analyze_email("Account locked", BAD)
+    assert verdict.overall == "scam"
+    assert not verdict.partial
+    assert verdict.skipped == ()
+
+
+def test_expired_budget_still_runs_quick_checks():
+    verdict = ui.analyze_email("Account locked", BAD, budget=Budget(0))
+    assert verdict.overall == "scam"
+    assert verdict.urls["http://badsite.ru/login"] == "malicious"
+    assert "https://example.com/help" in verdict.urls
+    assert verdict.partial
+    assert {"deep_urls", "burst"} <= set(verdict.skipped)
+    assert "quick_urls" not in verdict.skipped
+
+
+def test_quick_checks_are_capped_under_a_budget():
+    body = " ".join(f"https://host{i}.example/" for i in range(ui.MAX_QUICK_URLS + 10))
+    verdict = ui.analyze_email("links", body, budget=Budget(10_000))
+    assert len(verdict.urls) == ui.MAX_QUICK_URLS
+    assert "quick_urls" in verdict.skipped
+    assert len(ui.analyze_email("links", body).urls) == ui.MAX_QUICK_URLS + 10
+
+
+
+@pytest.fixture
+def client():
+    saved = dict(ui.app.config)
+    yield ui.app.test_client()
+    ui.app.config.clear()
+    ui.app.config.update(saved)
+
+
+def test_batch_outliving_the_request_budget(client):
+    ui.app.config["REQUEST_BUDGET_MS"] = 0  # spent before the first message
+    messages = [{"id": i, "subject": "Account locked", "body": BAD} for i in range(20)]
+    resp = client.post("/api/v1/analyze", json={"messages": messages})
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+
+    results, summary = lines[:-1], lines[-1]["summary"]
+    assert [r["index"] for r in results] == list(range(20))
+    for r in results:
+        assert r["overall"] == "scam"
+        assert r["urls"]["http://badsite.ru/login"] == "malicious"
+        assert r["partial"] and "quick_urls" not in r["skipped"]
+    assert summary["scanned"] == 20
+    assert summary["partial"] == 20
+
+
+def test_api_checks_every_url(client):
+    body = " ".join(f"https://host{i}.example/" for i in range(ui.MAX_QUICK_URLS + 10))
+    result = client.post("/api/v1/analyze", json={"subject": "links", "body": body}).get_json()
+    assert len(result["urls"]) == ui.MAX_QUICK_URLS + 10
+
+
+def test_messages_must_be_a_list(client):
+    resp = client.post("/api/v1/analyze", json={"messages": "x"})
+    assert resp.status_code == 400
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from burst import MIN_BURST_COUNT, RECENT_SLOTS, BurstTracker
+
+SLOT = 60
+SLOTS = 10
+
+
+@pytest.fixture
+def tracker():
+    return BurstTracker(width=256, slot_seconds=SLOT, slots=SLOTS, top_k=3, clock=lambda: 0.0)
+
+
+def fill(tracker, key, n, slot):
+    for _ in range(n):
+        tracker.observe([key], now=slot * SLOT)
+
+
+def test_no_score_while_warming_up(tracker):
+    fill(tracker, "new.example", 100, 0)
+    assert tracker.score("new.example", now=0) == (100, 0.0)
+    assert tracker.check(["new.example"], now=0) is None
+
+
+def test_recent_count_rotates_out(tracker):
+    fill(tracker, "a.example", 5, 0)
+    fill(tracker, "a.example", 7, 1)
+    assert tracker.score("a.example", now=1 * SLOT)[0] == 12
+    # RECENT_SLOTS = 2: slot 0 drops out of the recent window at slot 2
+    assert tracker.score("a.example", now=RECENT_SLOTS * SLOT)[0] == 7
+    assert tracker.score("a.example", now=(RECENT_SLOTS + 1) * SLOT)[0] == 0
+
+
+def test_whole_ring_expires(tracker):
+    fill(tracker, "a.example", 20, 0)
+    # once the ring wrapped there is no baseline left for a.example either
+    now = (SLOTS + RECENT_SLOTS) * SLOT
+    assert tracker.score("a.example", now=now) == (0, 0.0)
+    fill(tracker, "a.example", MIN_BURST_COUNT, SLOTS + RECENT_SLOTS)
+    assert tracker.check(["a.example"], now=now)[0] == "a.example"
+
+
+def test_burst_against_baseline(tracker):
+    for slot in range(SLOTS - 1):
+        fill(tracker, "steady.example", 10, slot)
+    fill(tracker, "steady.example", 10, SLOTS - 1)
+    fill(tracker, "campaign.example", MIN_BURST_COUNT, SLOTS - 1)
+    now = (SLOTS - 1) * SLOT
+    assert tracker.check(["steady.example"], now=now) is None
+    key, count, score = tracker.check(["steady.example", "campaign.example"], now=now)
+    assert (key, count) == ("campaign.example", MIN_BURST_COUNT)
+    assert [h[0] for h in tracker.bursting(now=now)] == ["campaign.example"]
+
+
+def test_heavy_hitters_keep_top_k(tracker):
+    for i, n in enumerate([5, 1, 9, 7]):
+        fill(tracker, f"k{i}.example", n, 0)
+    assert [h[0] for h in tracker.heavy_hitters(now=0)] == ["k2.example", "k3.example", "k0.example"]
+    # k3 and k0 empty out with their slot; k1's count there never made the list
+    fill(tracker, "k2.example", 1, RECENT_SLOTS)
+    assert [h[:2] for h in tracker.heavy_hitters(now=RECENT_SLOTS * SLOT)] == [("k2.example", 1)]
+
+
+def test_counts_are_shared_across_fork(tracker):
+    fill(tracker, "parent.example", 3, 0)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            fill(tracker, "child.example", 4, 0)
+            fill(tracker, "parent.example", 1, 0)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert tracker.score("parent.example", now=0)[0] == 4
+    assert [h[:2] for h in tracker.heavy_hitters(now=0)] == [("parent.example", 4), ("child.example", 4)]
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from feature_store import FeatureStore
+
+TEXTS = [
+    "verify your account now",
+    "team meeting schedule for tomorrow",
+    "click here to claim your gift card",
+    "your monthly bill is ready",
+    "account password reset request",
+]
+
+
+@pytest.fixture
+def vectorizer():
+    return TfidfVectorizer().fit(TEXTS)
+
+
+def test_append_skips_known_ids(tmp_path, vectorizer):
+    store = FeatureStore(vectorizer, root=tmp_path)
+    assert store.append([1, 2], TEXTS[:2]) == 2
+    assert store.append([2, 3], TEXTS[1:3]) == 1
+    assert store.ids == ["1", "2", "3"]
+
+    expected = vectorizer.transform(TEXTS[:3]).toarray()
+    np.testing.assert_allclose(store.matrix().toarray(), expected, rtol=1e-6)
+
+
+def test_reopen_keeps_rows(tmp_path, vectorizer):
+    FeatureStore(vectorizer, root=tmp_path).append([1, 2], TEXTS[:2])
+    store = FeatureStore(vectorizer, root=tmp_path)
+    assert len(store) == 2
+    np.testing.assert_allclose(store.row(2).toarray(), vectorizer.transform(TEXTS[1:2]).toarray(), rtol=1e-6)
+
+
+def test_crash_before_indptr_is_rolled_back(tmp_path, vectorizer):
+    store = FeatureStore(vectorizer, root=tmp_path)
+    store.append([1, 2], TEXTS[:2])
+
+    # an append of id 3 that died after data, indices and ids but before indptr
+    X = vectorizer.transform(TEXTS[2:3]).tocsr()
+    with open(store._file("data.f32"), "ab") as f:
+        X.data.astype(np.float32).tofile(f)
+    with open(store._file("indices.i32"), "ab") as f:
+        X.indices.astype(np.int32).tofile(f)
+    with open(store._file("ids.txt"), "a") as f:
+        f.write("3\n")
+    with open(store._file("indptr.i32"), "ab") as f:
+        f.write(b"\x01\x00")  # and a torn indptr entry
+
+    store = FeatureStore(vectorizer, root=tmp_path)
+    assert store.ids == ["1", "2"]
+    assert 3 not in store
+
+    assert store.append([4], TEXTS[3:4]) == 1
+    store = FeatureStore(vectorizer, root=tmp_path)
+    assert store.ids == ["1", "2", "4"]
+    np.testing.assert_allclose(store.row(4).toarray(), vectorizer.transform(TEXTS[3:4]).toarray(), rtol=1e-6)
+    np.testing.assert_allclose(store.row(1).toarray(), vectorizer.transform(TEXTS[:1]).toarray(), rtol=1e-6)
+
+
+def test_append_is_incremental(tmp_path, vectorizer, monkeypatch):
+    store = FeatureStore(vectorizer, root=tmp_path)
+    # recovery (re-reading ids.txt, truncating) only runs on open
+    monkeypatch.setattr(FeatureStore, "_recover", lambda self: pytest.fail("append re-opened the store"))
+    for i, text in enumerate(TEXTS):
+        assert store.append([i], [text]) == 1
+    assert store.ids == [str(i) for i in range(len(TEXTS))]
+    assert 4 in store
+    np.testing.assert_allclose(store.matrix().toarray(), vectorizer.transform(TEXTS).toarray(), rtol=1e-6)
+    monkeypatch.undo()
+
+    reopened = FeatureStore(vectorizer, root=tmp_path)
+    assert reopened.ids == store.ids
+    np.testing.assert_allclose(reopened.row(2).toarray(), store.row(2).toarray())
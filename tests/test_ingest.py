@@ -0,0 +1,83 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from budget import Budget
+from ingest import Scanner
+from message_store import Verdict
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_partial_scan_is_finished_in_the_background():
+    budgets = []
+
+    def analyze(subject, body, budget=None):
+        budgets.append(budget)
+        if budget is not None and budget.expired():
+            return Verdict("probably safe", skipped=["deep_urls"])
+        return Verdict("scam")
+
+    scanner = Scanner(analyze, "v1", workers=1, make_budget=lambda: Budget(0))
+    email = SimpleNamespace(id=1, subject="s", body="b", analysis=None)
+
+    first = scanner.result(email, timeout=5)
+    assert first.partial and first.version == "v1"
+    # the partial result is re-queued and finished without a budget
+    wait_for(lambda: not email.analysis.partial)
+    assert email.analysis.overall == "scam"
+    assert budgets[0] is not None and budgets[1] is None
+
+
+def test_version_change_rescans_stale_messages():
+    lock = threading.Lock()
+    scanned = []
+
+    def analyze(subject, body, budget=None):
+        with lock:
+            scanned.append(subject)
+        return Verdict("probably safe")
+
+    scanner = Scanner(analyze, "v1", workers=1)
+    emails = [SimpleNamespace(id=i, subject=str(i), body="", analysis=None) for i in range(3)]
+    for e in emails:
+        scanner.result(e, timeout=5)
+    assert scanner.set_version("v1", emails) == 0
+    assert scanner.set_version("v2", emails) == 3
+    wait_for(lambda: all(scanner.is_current(e) for e in emails))
+    assert sorted(scanned) == ["0", "0", "1", "1", "2", "2"]
+
+
+def test_quiesce_waits_for_follow_up_scans_and_stops_version_checks():
+    release = threading.Event()
+    checks = []
+
+    def analyze(subject, body, budget=None):
+        release.wait(5)
+        if budget is not None:
+            return Verdict("probably safe", skipped=["deep_urls"])
+        return Verdict("scam")
+
+    def source():
+        checks.append(1)
+        return "v1"
+
+    scanner = Scanner(analyze, "v1", workers=1, make_budget=lambda: Budget(None))
+    email = SimpleNamespace(id=1, subject="s", body="b", analysis=None)
+    scanner.watch_version(source, [email], interval=0.01)
+    scanner.submit(email)
+    wait_for(lambda: checks)
+    assert scanner.quiesce(timeout=0.05) is False
+
+    release.set()
+    # idle only once the partial result's follow-up scan has finished too
+    assert scanner.quiesce(timeout=5)
+    assert email.analysis.overall == "scam"
+    seen = len(checks)
+    time.sleep(0.1)
+    assert len(checks) == seen
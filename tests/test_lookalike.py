@@ -0,0 +1,45 @@
+import pytest
+
+from lookalike import HOMOGLYPH, MIXED_SCRIPT, LookalikeIndex
+
+BRANDS = ["paypal.com", "apple.com", "microsoft.com"]
+
+
+@pytest.fixture
+def index():
+    return LookalikeIndex(BRANDS)
+
+
+@pytest.mark.parametrize("host, brand", [
+    ("pаypal.com", "paypal.com"),  # Cyrillic а
+    ("xn--pypal-4ve.com", "paypal.com"),  # same, punycoded
+    ("rnicrosoft.com", "microsoft.com"),
+    ("secure.аpple.com", "apple.com"),
+])
+def test_homoglyphs(index, host, brand):
+    assert index.check(host) == (HOMOGLYPH, brand)
+
+
+@pytest.mark.parametrize("host", [
+    "pаypаl-login.com",  # Latin + Cyrillic
+    "gοogle-drive.net",  # Latin + Greek
+    "お名前한글.com",  # Japanese kana with Hangul
+])
+def test_mixed_scripts(index, host):
+    assert index.check(host) == (MIXED_SCRIPT, None)
+
+
+@pytest.mark.parametrize("host", [
+    "paypal.com",
+    "www.apple.com",
+    "お名前.com",  # Han + Hiragana
+    "ドメイン名例.jp",  # Katakana + Han
+    "xn--eckwd4c7cu47r2wf.jp",  # the same, punycoded
+    "データー東京.jp",
+    "sony銀行.jp",  # Latin + Han
+    "삼성전자.kr",
+    "中文ㄅㄆ.tw",
+    "bücher.de",
+])
+def test_allowed_hosts(index, host):
+    assert index.check(host) is None
@@ -0,0 +1,74 @@
+import random
+
+from search_index import BLOCK, SUPERBLOCK, SearchIndex
+
+WORDS = ["account", "verify", "click", "here", "meeting", "invoice", "gift", "card", "password", "team"]
+
+
+def build(n, seed=0):
+    rnd = random.Random(seed)
+    index = SearchIndex()
+    for doc_id in range(n):
+        body = " ".join(rnd.choices(WORDS, k=rnd.randint(1, 20)))
+        if rnd.random() < 0.3:
+            body += " click here"
+        verdict = rnd.choices([None, "scam", "probably safe", "likely scam"], [30, 30, 39, 1])[0]
+        index.add(doc_id, "message", body, verdict)
+    return index
+
+
+def test_top_k_matches_full_ranking():
+    # long enough for block and superblock pruning on the common terms
+    index = build(BLOCK * SUPERBLOCK + 3000)
+    for doc_id in range(0, 3000, 7):
+        index.remove(doc_id)
+    for query in ["account", "verify account", '"click here"', '"here click"', "gift card team"]:
+        # "likely scam" is rarer than any term: its list drives the query
+        for verdict in [None, "scam", "likely scam"]:
+            full = index.search(query, verdict, limit=None)
+            assert full
+            for limit in [1, 10, 50]:
+                assert index.search(query, verdict, limit) == full[:limit]
+
+
+def test_ties_rank_newest_first():
+    index = SearchIndex()
+    for doc_id in range(1000):
+        index.add(doc_id, "your account", "please verify your account")
+    assert index.search("account", limit=5) == [999, 998, 997, 996, 995]
+
+
+def test_phrases_stay_inside_a_field():
+    index = SearchIndex()
+    index.add(1, "please click", "here is the agenda")
+    index.add(2, "update", "please click here")
+    assert index.search('"click here"') == [2]
+    assert index.search("click here") == [2, 1]
+
+
+def test_remove_and_verdicts():
+    index = SearchIndex()
+    index.add(1, "invoice", "your invoice", "scam")
+    index.add(2, "invoice", "another invoice", "probably safe")
+    index.add(3, "invoice", "final invoice", "scam")
+    assert index.search("", "scam") == [3, 1]
+    index.remove(3)
+    index.set_verdict(2, "scam")
+    assert index.search("", "scam") == [2, 1]
+    assert set(index.search("invoice")) == {1, 2}
+    assert len(index) == 2
+
+
+def test_verdict_changes_move_between_filters():
+    index = build(3000, seed=1)
+    rare = index.search("account", "likely scam", limit=None)
+    assert len(rare) >= 2
+    moved, kept = rare[: len(rare) // 2], rare[len(rare) // 2:]
+    for doc_id in moved:
+        index.set_verdict(doc_id, "scam")
+    assert index.search("account", "likely scam", limit=None) == kept
+    assert set(moved) <= set(index.search("account", "scam", limit=None))
+
+    newest = index.search("", "likely scam", limit=None)
+    assert newest == sorted(newest, reverse=True)
+    assert index.search("", "likely scam", limit=3) == newest[:3]
@@ -0,0 +1,60 @@
+import pytest
+
+from lookalike import load_brands
+from typosquat import TyposquatIndex, edit_distance, load_words
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TyposquatIndex.build(load_brands(), load_words())
+
+
+@pytest.mark.parametrize("host, brand, distance", [
+    ("paypall.com", "paypal.com", 1),
+    ("gooogle.com", "google.com", 1),
+    ("amazom.com", "amazon.com", 1),
+    ("netflx.com", "netflix.com", 1),
+    ("dropbx.net", "dropbox.com", 1),
+    ("login.faceboook.com", "facebook.com", 1),
+    ("instagarm.com", "instagram.com", 1),  # transposition
+    ("microsfto.com", "microsoft.com", 2),
+    ("paypa1.com:443", "paypal.com", 1),
+    # <typo>-<word>: the leading part is compared too
+    ("paypall-support.com", "paypal.com", 1),
+    ("gooogle-login.com", "google.com", 1),
+    ("netflx-billing.com", "netflix.com", 1),
+    ("amazom-security.net", "amazon.com", 1),
+    ("secure.micorsoft-support.co.uk", "microsoft.com", 1),
+])
+def test_typos_match(index, host, brand, distance):
+    assert index.closest(host) == (brand, distance)
+
+
+@pytest.mark.parametrize("host", [
+    # brands themselves, on their own suffix
+    "paypal.com", "www.google.com", "zoom.us",
+    # ordinary words near short brands
+    "apply-now.com", "ample.com", "chose.com", "chaser.com", "boom.com", "zoo.com",
+    "uses.com", "vista.com", "visas.gov", "strip.com", "cloud.com",
+    # hyphenated words containing something brand-like
+    "my-cloud.net", "room-booking.com", "paypal-secure.com",
+    # ordinary words one edit from a brand, alone or leading a hyphenated label
+    "offices.com", "officer.net", "looking.com", "finance.com", "stripes.com",
+    "looking-glass.com", "cooking-school.org", "offices-online.com",
+    # only the leading part is compared
+    "support-paypall.com",
+])
+def test_words_do_not_match(index, host):
+    assert index.closest(host) is None
+
+
+def test_edit_distance():
+    assert edit_distance("paypal", "paypal", 2) == 0
+    assert edit_distance("paypla", "paypal", 2) == 1
+    assert edit_distance("microsfto", "microsoft", 2) == 2
+    assert edit_distance("abcdef", "uvwxyz", 2) == 3
+
+
+def test_without_word_list_words_match():
+    index = TyposquatIndex.build(load_brands())
+    assert index.closest("offices.com") == ("office.com", 1)
@@ -1,29 +1,237 @@
 import pandas as pd
+import numpy as np
+import scipy.sparse as sp
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, train_test_split
+from sklearn.pipeline import make_pipeline
+import argparse
+import hashlib
 import joblib
+import json
+import os
 import time
 import sys
 
+from compact_model import COMPACT_MODEL_PATH, compare_models, export_compact, load_compact, measure_load
+
+DATASET_PATH = "mini_spam_dataset.csv"
+CACHE_DIR = ".train_cache"
+CLF_PATH = "spam_classifier.joblib"
+VEC_PATH = "vectorizer.joblib"
+REPORT_PATH = "eval_report.json"
+
+
+def make_vectorizer():
+	return TfidfVectorizer(stop_words="english")
+
+
+def make_classifier():
+	return LogisticRegression(max_iter=1000)
+
+
+def feature_cache_key(csv_path, vectorizer):
+	# dataset bytes + vectorizer settings; anything else can change freely
+	h = hashlib.sha256()
+	with open(csv_path, "rb") as f:
+		for block in iter(lambda: f.read(1 << 20), b""):
+			h.update(block)
+	params = vectorizer.get_params()
+	params["dtype"] = np.dtype(params["dtype"]).str
+	h.update(repr(sorted(params.items())).encode("utf-8"))
+	return h.hexdigest()[:16]
+
+
+def load_cached_features(path):
+	t0 = time.time()
+	with np.load(os.path.join(path, "dataset.npz"), allow_pickle=False) as z:
+		df = pd.DataFrame({"text": z["text"], "label": z["label"]})
+	X = sp.load_npz(os.path.join(path, "features.npz"))
+	vectorizer = joblib.load(os.path.join(path, "vectorizer.joblib"))
+	with open(os.path.join(path, "meta.json")) as f:
+		meta = json.load(f)
+	return df, X, vectorizer, meta, time.time() - t0
+
+
+def save_cached_features(path, df, X, vectorizer, meta):
+	os.makedirs(path, exist_ok=True)
+	np.savez_compressed(
+		os.path.join(path, "dataset.npz"),
+		text=df["text"].to_numpy(dtype=str),
+		label=df["label"].to_numpy(dtype=str),
+	)
+	sp.save_npz(os.path.join(path, "features.npz"), X.tocsr(), compressed=True)
+	joblib.dump(vectorizer, os.path.join(path, "vectorizer.joblib"))
+	# meta.json last: its presence marks a complete entry
+	with open(os.path.join(path, "meta.json"), "w") as f:
+		json.dump(meta, f)
+
+
+def load_features(csv_path, vectorizer, use_cache=True):
+	key = feature_cache_key(csv_path, vectorizer)
+	path = os.path.join(CACHE_DIR, key)
+
+	if use_cache and os.path.exists(os.path.join(path, "meta.json")):
+		df, X, vectorizer, meta, elapsed = load_cached_features(path)
+		saved = meta["parse_seconds"] + meta["vectorize_seconds"] - elapsed
+		print(f"Feature cache hit ({key}): loaded in {elapsed:.3f} seconds, "
+			  f"saved {saved:.3f} seconds of parsing and vectorization")
+		return df, X, vectorizer
+
+	print(f"Loading dataset '{csv_path}'...")
+	t0 = time.time()
+	df = pd.read_csv(csv_path)  # two columns: text, label
+	parse_seconds = time.time() - t0
+	print(f"Dataset loaded: {len(df)} rows")
+
+	if 'text' not in df.columns or 'label' not in df.columns:
+		print("ERROR: Dataset must contain 'text' and 'label' columns", file=sys.stderr)
+		sys.exit(1)
+
+	t0 = time.time()
+	X = vectorizer.fit_transform(df["text"])
+	vectorize_seconds = time.time() - t0
+
+	if use_cache:
+		save_cached_features(path, df, X, vectorizer, {
+			"parse_seconds": parse_seconds,
+			"vectorize_seconds": vectorize_seconds,
+		})
+		print(f"Feature cache stored ({key})")
+	return df, X, vectorizer
+
+
+def evaluate_quality(texts, labels, test_size=0.25, cv=None, seed=0):
+	# the vectorizer is refit inside each split so idf never sees test rows
+	pipeline = make_pipeline(make_vectorizer(), make_classifier())
+	if cv:
+		folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed)
+		y_true = labels
+		y_pred = cross_val_predict(pipeline, texts, labels, cv=folds)
+		method = {"type": "cv", "folds": cv}
+	else:
+		x_train, x_test, y_train, y_true = train_test_split(
+			texts, labels, test_size=test_size, stratify=labels, random_state=seed)
+		y_pred = pipeline.fit(x_train, y_train).predict(x_test)
+		method = {"type": "holdout", "test_size": test_size, "test_rows": len(y_true)}
+
+	classes = sorted(set(labels))
+	report = classification_report(y_true, y_pred, labels=classes, output_dict=True, zero_division=0)
+	return {
+		"method": method,
+		"accuracy": report.pop("accuracy", None),
+		"per_class": {c: report[c] for c in classes},
+		"macro_avg": report["macro avg"],
+		"confusion_matrix": {
+			"labels": classes,
+			"matrix": confusion_matrix(y_true, y_pred, labels=classes).tolist(),
+		},
+	}
+
+
+def _percentiles(samples):
+	ms = np.asarray(samples) * 1000
+	return {f"p{p}": float(np.percentile(ms, p)) for p in (50, 90, 99)}
+
+
+def profile_predictor(predict, texts, single_runs=500, batch_size=1000):
+	predict(texts[:1])  # warm-up
+
+	single = []
+	for i in range(single_runs):
+		text = texts[i % len(texts)]
+		t0 = time.perf_counter()
+		predict([text])
+		single.append(time.perf_counter() - t0)
+
+	batch = [texts[i % len(texts)] for i in range(batch_size)]
+	t0 = time.perf_counter()
+	predict(batch)
+	batch_seconds = time.perf_counter() - t0
+
+	return {
+		"single_latency_ms": _percentiles(single),
+		"batch_size": batch_size,
+		"batch_seconds": batch_seconds,
+		"batch_messages_per_second": batch_size / batch_seconds,
+	}
+
+
+def evaluate_serving(texts):
+	(clf, vectorizer), load_seconds, load_memory = measure_load(
+		lambda: (joblib.load(CLF_PATH), joblib.load(VEC_PATH)))
+	serving = {
+		"joblib": {
+			"files": {p: os.path.getsize(p) for p in (CLF_PATH, VEC_PATH)},
+			"load_ms": load_seconds * 1000,
+			"load_memory_bytes": load_memory,
+			**profile_predictor(lambda batch: clf.predict(vectorizer.transform(batch)), texts),
+		}
+	}
+	if os.path.exists(COMPACT_MODEL_PATH):
+		compact, load_seconds, load_memory = measure_load(lambda: load_compact(COMPACT_MODEL_PATH))
+		serving["compact"] = {
+			"files": {COMPACT_MODEL_PATH: os.path.getsize(COMPACT_MODEL_PATH)},
+			"load_ms": load_seconds * 1000,
+			"load_memory_bytes": load_memory,
+			**profile_predictor(compact.predict, texts),
+		}
+	return serving
+
+
+def evaluate(df, args):
+	texts = df["text"].tolist()
+	labels = df["label"].tolist()
+	report = {
+		"dataset": {"path": DATASET_PATH, "rows": len(df)},
+		"quality": evaluate_quality(texts, labels, test_size=args.test_size, cv=args.cv),
+		"serving": evaluate_serving(texts),
+	}
+	with open(args.report, "w") as f:
+		json.dump(report, f, indent=2)
+
+	quality = report["quality"]
+	print(f"Evaluation ({quality['method']['type']}): accuracy {quality['accuracy']:.4f}, "
+		  f"macro F1 {quality['macro_avg']['f1-score']:.4f}")
+	for c, m in quality["per_class"].items():
+		print(f"  {c}: precision {m['precision']:.4f} recall {m['recall']:.4f} f1 {m['f1-score']:.4f}")
+	print(f"  confusion matrix {quality['confusion_matrix']['labels']}: {quality['confusion_matrix']['matrix']}")
+	for name, s in report["serving"].items():
+		lat = s["single_latency_ms"]
+		print(f"  {name}: p50 {lat['p50']:.3f} ms, p99 {lat['p99']:.3f} ms, "
+			  f"{s['batch_messages_per_second']:.0f} msg/s, {sum(s['files'].values())} bytes on disk, "
+			  f"{s['load_memory_bytes']} bytes loaded")
+	print(f"Saved evaluation report to '{args.report}'")
+
 
 def main():
-	try:
-		print("Loading dataset 'mini_spam_dataset.csv'...")
-		df = pd.read_csv("mini_spam_dataset.csv")  # two columns: text, label
-		print(f"Dataset loaded: {len(df)} rows")
+	parser = argparse.ArgumentParser(description="Train the spam classifier")
+	parser.add_argument("--no-cache", action="store_true",
+						help="re-parse and re-vectorize the dataset, bypassing the feature cache")
+	parser.add_argument("--evaluate", action="store_true",
+						help="evaluate on held-out data and profile the saved models instead of training")
+	parser.add_argument("--test-size", type=float, default=0.25,
+						help="held-out fraction for --evaluate (default: 0.25)")
+	parser.add_argument("--cv", type=int, default=None,
+						help="use K-fold cross-validation instead of a held-out split")
+	parser.add_argument("--report", default=REPORT_PATH,
+						help=f"JSON report path for --evaluate (default: {REPORT_PATH})")
+	args = parser.parse_args()
 
-		if 'text' not in df.columns or 'label' not in df.columns:
-			print("ERROR: Dataset must contain 'text' and 'label' columns", file=sys.stderr)
-			sys.exit(1)
+	try:
+		vectorizer = make_vectorizer()
+		df, X, vectorizer = load_features(DATASET_PATH, vectorizer, use_cache=not args.no_cache)
+		y = df["label"]
 
 		print("Class distribution:")
 		print(df['label'].value_counts().to_string())
 
-		vectorizer = TfidfVectorizer(stop_words="english")
-		X = vectorizer.fit_transform(df["text"])
-		y = df["label"]
+		if args.evaluate:
+			evaluate(df, args)
+			return
 
-		clf = LogisticRegression(max_iter=1000)
+		clf = make_classifier()
 		print("Training classifier...")
 		t0 = time.time()
 		clf.fit(X, y)
@@ -33,13 +241,24 @@ def main():
 		train_acc = clf.score(X, y)
 		print(f"Training accuracy: {train_acc:.4f}")
 
-		clf_path = "spam_classifier.joblib"
-		vec_path = "vectorizer.joblib"
+		clf_path = CLF_PATH
+		vec_path = VEC_PATH
 		joblib.dump(clf, clf_path)
 		joblib.dump(vectorizer, vec_path)
 		print(f"Saved classifier to '{clf_path}'")
 		print(f"Saved vectorizer to '{vec_path}'")
 
+		export_compact(clf, vectorizer, COMPACT_MODEL_PATH)
+		print(f"Saved compact model to '{COMPACT_MODEL_PATH}'")
+
+		report = compare_models(clf_path, vec_path, COMPACT_MODEL_PATH, df["text"].tolist(), y)
+		print("Compact model report (full -> compact):")
+		print(f"  size on disk: {report['full_size_bytes']} -> {report['compact_size_bytes']} bytes")
+		print(f"  load time:    {report['full_load_ms']:.2f} -> {report['compact_load_ms']:.2f} ms")
+		print(f"  load memory:  {report['full_memory_bytes']} -> {report['compact_memory_bytes']} bytes")
+		print(f"  accuracy:     {report['full_accuracy']:.4f} -> {report['compact_accuracy']:.4f} "
+			  f"(delta {report['accuracy_delta']:+.4f}, agreement {report['agreement']:.4f})")
+
 	except Exception as e:
 		print("ERROR during training:", e, file=sys.stderr)
 		sys.exit(1)
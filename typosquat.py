@@ -0,0 +1,171 @@
+import hashlib
+import os
+import pickle
+from functools import lru_cache
+
+from lookalike import hostname, split_host
+
+# Typosquat detection with a symmetric-deletion (SymSpell-style) index.
+#
+# For every brand label, all strings reachable by deleting up to
+# MAX_DISTANCE characters from its first PREFIX_LENGTH characters are
+# indexed. A host label is expanded the same way, and the brands sharing
+# any deletion are the only candidates that get a real edit-distance
+# check. Cost per host is therefore independent of the brand list size.
+#
+# Building the deletion map for tens of thousands of brands takes seconds,
+# so it is pickled next to the brand list and reused while the list and
+# parameters are unchanged.
+#
+# Short labels sit one edit away from too many ordinary words (zoo/zoom,
+# uses/usps, chose/chase), so both the brand and the host label need
+# MIN_LABEL_LENGTH characters before any distance is allowed. Longer
+# labels that are ordinary words (offices, looking, finance) are filtered
+# with a word list (WORDS_PATH). Besides the whole registrable label, the
+# first part of a hyphenated one is compared, which is where the typo sits
+# in paypall-support.com; room-booking.com or my-cloud.net don't match
+# because their first parts are too short.
+
+INDEX_PATH = "typosquat.index"
+WORDS_PATH = "common_words.txt"
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+MIN_LABEL_LENGTH = 6
+
+
+def load_words(path=WORDS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return frozenset(
+            w for w in (line.strip().lower() for line in f)
+            if len(w) >= MIN_LABEL_LENGTH and not w.startswith("#")
+        )
+
+
+def allowed_distance(label: str) -> int:
+    if len(label) < MIN_LABEL_LENGTH:
+        return 0
+    return 1 if len(label) < 9 else MAX_DISTANCE
+
+
+def deletions(word: str, max_distance: int):
+    word = word[:PREFIX_LENGTH]
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # optimal string alignment distance, giving up once it exceeds limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # a shared prefix/suffix never changes the distance; typos leave long ones
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return max(len(a), len(b))
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def index_key(brands) -> str:
+    h = hashlib.sha256(f"{MAX_DISTANCE}/{PREFIX_LENGTH}/{MIN_LABEL_LENGTH}\n".encode())
+    for brand in sorted(brands):
+        h.update(brand.encode("utf-8") + b"\n")
+    return h.hexdigest()[:16]
+
+
+class TyposquatIndex:
+    def __init__(self, brands, labels, deletes, key, words=()):
+        self.brands = brands
+        self.labels = labels
+        self.deletes = deletes
+        self.key = key
+        self.brand_set = frozenset(brands)
+        self.words = frozenset(words)  # ordinary words, never reported
+        self.closest = lru_cache(maxsize=65536)(self._closest)
+
+    @classmethod
+    def build(cls, brands, words=()):
+        brands = sorted(set(brands))
+        labels = [split_host(b)[0] for b in brands]
+        deletes = {}
+        for i, label in enumerate(labels):
+            for d in deletions(label, allowed_distance(label)):
+                deletes.setdefault(d, []).append(i)
+        return cls(brands, labels, {d: tuple(ids) for d, ids in deletes.items()}, index_key(brands), words)
+
+    @classmethod
+    def load_or_build(cls, brands, path=INDEX_PATH, words=()):
+        key = index_key(set(brands))
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = pickle.load(f)
+                if data["key"] == key:
+                    return cls(data["brands"], data["labels"], data["deletes"], key, words)
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+                pass
+        index = cls.build(brands, words)
+        index.save(path)
+        return index
+
+    def save(self, path=INDEX_PATH):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(
+                {"key": self.key, "brands": self.brands, "labels": self.labels, "deletes": self.deletes},
+                f, protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp, path)
+
+    def closest_label(self, word):
+        # -> (brand, distance) with 0 < distance <= the brand's allowance
+        if len(word) < MIN_LABEL_LENGTH or word in self.words:
+            return None
+        # distance 2 is only allowed for brands of 9+ characters, which
+        # words shorter than 7 characters can't get within 2 edits of
+        depth = MAX_DISTANCE if len(word) >= 7 else 1
+        best = None
+        seen = set()
+        for d in deletions(word, depth):
+            for i in self.deletes.get(d, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                label = self.labels[i]
+                limit = allowed_distance(label)
+                if abs(len(label) - len(word)) > limit:
+                    continue
+                dist = edit_distance(word, label, limit)
+                if 0 < dist <= limit and (best is None or dist < best[1]):
+                    best = (self.brands[i], dist)
+        return best
+
+    def _closest(self, host):
+        label, _, suffix = split_host(hostname(host))
+        if not label or ".".join([label] + suffix) in self.brand_set:
+            return None
+        match = self.closest_label(label)
+        if match is None and "-" in label:
+            match = self.closest_label(label.split("-", 1)[0])
+        return match
@@ -0,0 +1,67 @@
+import json
+import sqlite3
+from contextlib import closing
+
+# User triage marks ("reported", "spam"), kept in SQLite.
+#
+# Under serve.py every worker is a forked copy of the app, so anything a
+# request changes in memory is only seen by that one worker. These marks
+# have to survive that, so they live in a database file shared by all
+# processes. A connection is opened per call: nothing is carried across
+# fork, and each update is one IMMEDIATE transaction. Being a file, the
+# marks also outlive restarts; the app takes its path from
+# USER_ACTIONS_PATH (app.config or the environment).
+
+ACTIONS_PATH = "user_actions.db"
+KINDS = ("reported", "spam")
+
+
+class ActionStore:
+    def __init__(self, path=ACTIONS_PATH):
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS marks ("
+                " email_id INTEGER NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " PRIMARY KEY (email_id, kind)"
+                ") WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=10, isolation_level=None))
+
+    @staticmethod
+    def _present(db, kind, email_ids):
+        rows = db.execute(
+            "SELECT email_id FROM marks WHERE kind = ? AND email_id IN (SELECT value FROM json_each(?))",
+            (kind, json.dumps(sorted(email_ids))),
+        )
+        return {row[0] for row in rows}
+
+    def update(self, kind, email_ids, add):
+        # set or clear kind on every id at once; returns the ids that changed
+        if kind not in KINDS:
+            raise ValueError(f"unknown mark: {kind!r}")
+        email_ids = set(email_ids)
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                present = self._present(db, kind, email_ids)
+                if add:
+                    changed = email_ids - present
+                    db.executemany("INSERT INTO marks VALUES (?, ?)", ((i, kind) for i in changed))
+                else:
+                    changed = present
+                    db.executemany("DELETE FROM marks WHERE email_id = ? AND kind = ?",
+                                   ((i, kind) for i in changed))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return changed
+
+    def marked(self, kind, email_ids):
+        with self._connect() as db:
+            return self._present(db, kind, email_ids)